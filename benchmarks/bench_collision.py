@@ -0,0 +1,75 @@
+'''
+Map.check_collision: tile occupancy grid vs colliderect over every tile rect.
+
+Builds a synthetic --size x --size tile map with --density of the tiles
+blocked, then checks player-sized rects at random positions (plus a few
+oversized and off-map ones) with the old loop over every collision rect
+and with CollisionGrid, and asserts both agree on every query.
+
+Run from the project root:
+    python -m benchmarks.bench_collision [--size 500] [--density 0.2]
+'''
+import argparse
+import random
+import time
+
+import pygame as pg
+
+from src.maps.collision_grid import CollisionGrid
+
+TILE_SIZE = 64
+QUERIES = 20000
+
+
+def rect_loop(rects: list[pg.Rect], rect: pg.Rect) -> bool:
+    # Map.check_collision before the grid
+    for obj in rects:
+        if rect.colliderect(obj):
+            return True
+    return False
+
+
+def timed(check, queries: list[pg.Rect]) -> tuple[float, list[bool]]:
+    start = time.perf_counter()
+    results = [check(q) for q in queries]
+    return (time.perf_counter() - start) / len(queries), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--density", type=float, default=0.2)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'tiles':>9}{'rects':>9}{'loop us':>11}{'grid us':>10}{'speedup':>9}")
+    for size in sorted({25, 100, args.size}):
+        grid = CollisionGrid(size, size, TILE_SIZE)
+        rects = []
+        for y in range(size):
+            for x in range(size):
+                if rng.random() < args.density:
+                    grid.add(x, y)
+                    rects.append(pg.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+
+        extent = size * TILE_SIZE
+        queries = [pg.Rect(rng.randrange(-TILE_SIZE, extent), rng.randrange(-TILE_SIZE, extent), 56, 56)
+                   for _ in range(QUERIES)]
+        queries += [pg.Rect(rng.randrange(extent), rng.randrange(extent), rng.randrange(-300, 300),
+                            rng.randrange(-300, 300)) for _ in range(200)]
+        queries += [pg.Rect(-500, -500, 100, 100), pg.Rect(extent, 0, 64, 64), pg.Rect(extent - 1, 0, 64, 64)]
+
+        # The loop is slow on big maps, time it on a sample
+        loop_queries = queries[:max(200, QUERIES * 1000 // max(len(rects), 1))]
+        loop_time, expected = timed(lambda q: rect_loop(rects, q), loop_queries)
+        grid_time, results = timed(grid.check, queries)
+        assert results[:len(expected)] == expected
+        # Full agreement on the rest with C-speed collidelist
+        assert results == [q.collidelist(rects) != -1 for q in queries]
+
+        print(f"{size}x{size:<5}{len(rects):>9}{loop_time * 1e6:>11.1f}{grid_time * 1e6:>10.2f}"
+              f"{loop_time / grid_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
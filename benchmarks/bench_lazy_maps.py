@@ -0,0 +1,106 @@
+'''
+GameManager startup with every map built up front vs lazily on first access.
+
+Writes a world of --maps synthetic --size x --size tile maps (with the real
+tileset) and a save for it, fills the baked map cache, then starts a fresh
+process per case that loads the save and draws the first frame, walks
+through --visit maps and reports the time and resident memory after each
+step. "eager" raises MAX_LOADED_MAPS and touches every map during startup,
+like GameManager.from_dict used to; "lazy" keeps the default budget.
+
+Run from the project root:
+    python -m benchmarks.bench_lazy_maps [--maps 40] [--size 120] [--visit 10]
+'''
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_map_render import write_synthetic_tmx
+
+
+def resident_mib() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def child(save: str, cache_dir: str, mode: str, visit: int) -> None:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame as pg
+
+    from src.core.managers.game_manager import GameManager
+    from src.utils import GameSettings, PositionCamera
+
+    GameSettings.MAP_CACHE_DIR = cache_dir
+    pg.init()
+    screen = pg.display.set_mode((GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT))
+    before = resident_mib()
+
+    start = time.perf_counter()
+    gm = GameManager.load(save)
+    if mode == "eager":
+        GameSettings.MAX_LOADED_MAPS = len(gm.map_entries)
+        for key in gm.map_entries:
+            gm.get_map(key)
+    gm.current_map.draw(screen, PositionCamera(0, 0))
+    startup = time.perf_counter() - start
+    result = {"startup": startup, "rss": [resident_mib() - before]}
+
+    for key in list(gm.map_entries)[1:visit]:
+        gm.switch_map(key)
+        gm.try_switch_map()
+        gm.current_map.draw(screen, PositionCamera(0, 0))
+        result["rss"].append(resident_mib() - before)
+    result["loaded"] = len(gm.maps)
+    print(json.dumps(result))
+
+
+def run(save: str, cache_dir: str, mode: str, visit: int) -> dict:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_lazy_maps", "--child",
+                          save, cache_dir, mode, str(visit)],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", type=int, default=40)
+    parser.add_argument("--size", type=int, default=120)
+    parser.add_argument("--visit", type=int, default=10)
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        save, cache_dir, mode, visit = args.child
+        child(save, cache_dir, mode, int(visit))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = random.Random(0)
+        entries = []
+        for i in range(args.maps):
+            path = os.path.join(tmp, f"world{i}.tmx")
+            write_synthetic_tmx(path, args.size, rng)
+            entries.append({"path": path, "teleport": [], "enemy_trainers": [], "merchants": [],
+                            "player": {"x": 10, "y": 10}})
+        save = os.path.join(tmp, "save.json")
+        with open(save, "w") as f:
+            json.dump({"map": entries, "current_map": entries[0]["path"],
+                       "player": {"x": 10, "y": 10}, "bag": None}, f)
+        cache_dir = os.path.join(tmp, "cache")
+        # Fill the cache so both cases load maps the way a second start does
+        run(save, cache_dir, "eager", 1)
+
+        print(f"{args.maps} maps of {args.size}x{args.size} tiles, visiting {args.visit}")
+        print(f"  {'':<7}{'startup ms':>11}{'RSS MiB at start':>18}{'after visits':>14}{'loaded':>8}")
+        for mode in ("eager", "lazy"):
+            r = run(save, cache_dir, mode, args.visit)
+            print(f"  {mode:<7}{r['startup'] * 1000:>11.1f}{r['rss'][0]:>18.1f}{r['rss'][-1]:>14.1f}{r['loaded']:>8}")
+
+
+if __name__ == "__main__":
+    main()
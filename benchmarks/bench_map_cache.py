@@ -0,0 +1,80 @@
+'''
+Map loading with and without the baked map cache.
+
+Each run is a fresh process (like starting the game) that times building
+every Map in the save, then drawing the first frame of the current map.
+It runs with the cache disabled, with an empty cache directory (cold: the
+.tmx files are parsed and the cache is written) and again with the cache
+filled by the cold run (warm: nothing is parsed). The peak resident size
+of each process is printed as well.
+
+Run from the project root:
+    python -m benchmarks.bench_map_cache [--save saves/game0.json] [--runs 3]
+'''
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(save: str, cache_dir: str) -> None:
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame as pg
+
+    from src.maps import Map
+    from src.utils import GameSettings, Position, PositionCamera
+
+    GameSettings.MAP_CACHE_DIR = cache_dir
+    with open(save) as f:
+        data = json.load(f)
+    pg.init()
+    screen = pg.display.set_mode((GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT))
+
+    start = time.perf_counter()
+    maps = {entry["path"]: Map(entry["path"], [], Position(0, 0)) for entry in data["map"]}
+    load = time.perf_counter() - start
+    start = time.perf_counter()
+    maps[data["current_map"]].draw(screen, PositionCamera(0, 0))
+    first_frame = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"load": load, "first_frame": first_frame, "rss": rss}))
+
+
+def run(save: str, cache_dir: str) -> dict:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_map_cache", "--child", save, cache_dir],
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", default="saves/game0.json")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    with open(args.save) as f:
+        paths = [entry["path"] for entry in json.load(f)["map"]]
+    print(f"{len(paths)} maps: {', '.join(paths)}, best of {args.runs}")
+    print(f"  {'':<10}{'load ms':>10}{'first frame ms':>16}{'peak RSS MiB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = {
+            "no cache": [run(args.save, "") for _ in range(args.runs)],
+            # Every cold run starts from an empty cache directory
+            "cold": [run(args.save, os.path.join(tmp, str(i))) for i in range(args.runs)],
+            "warm": [run(args.save, os.path.join(tmp, "0")) for _ in range(args.runs)],
+        }
+    for name, results in cases.items():
+        best = min(results, key=lambda r: r["load"])
+        print(f"  {name:<10}{best['load'] * 1000:>10.1f}{best['first_frame'] * 1000:>16.1f}{best['rss']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+'''
+Frame times around door transitions with and without MapPreloader.
+
+Writes a ring of --maps synthetic --size x --size tile maps, each with a
+door to the next and the previous one, and walks through --doors doors:
+the player stays --frames frames on a map, paced at 60 FPS like the game,
+then switches to the next map. Every frame runs try_switch_map() and draws
+the current map. The transition frame is the one that swaps maps and
+draws the new map for the first time; without preloading it builds the
+map and bakes every chunk in view on the game thread.
+
+Both runs use a filled map cache, as on any start after the first one.
+
+Run from the project root:
+    python -m benchmarks.bench_map_preload [--maps 6] [--size 120] [--doors 20]
+'''
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+import pygame as pg
+
+from benchmarks.bench_map_render import write_synthetic_tmx
+from src.core.managers.game_manager import GameManager
+from src.utils import GameSettings
+
+FRAME = 1 / 60
+
+
+def write_world(tmp: str, maps: int, size: int) -> str:
+    rng = random.Random(0)
+    paths = [os.path.join(tmp, f"ring{i}.tmx") for i in range(maps)]
+    entries = []
+    for i, path in enumerate(paths):
+        write_synthetic_tmx(path, size, rng)
+        doors = [{"x": size // 2, "y": 2, "destination": paths[(i + 1) % maps]},
+                 {"x": size // 2, "y": size - 3, "destination": paths[i - 1]}]
+        entries.append({"path": path, "teleport": doors, "enemy_trainers": [], "merchants": [],
+                        "player": {"x": rng.randrange(size), "y": rng.randrange(size)}})
+    save = os.path.join(tmp, "save.json")
+    with open(save, "w") as f:
+        json.dump({"map": entries, "current_map": paths[0], "player": {"x": 10, "y": 10}, "bag": None}, f)
+    return save
+
+
+def walk(save: str, screen: pg.Surface, doors: int, frames: int) -> tuple[list[float], list[float], GameManager]:
+    gm = GameManager.load(save)
+    keys = list(gm.map_entries)
+    transitions, others = [], []
+    deadline = time.perf_counter()
+    for door in range(doors):
+        for frame in range(frames):
+            start = time.perf_counter()
+            gm.try_switch_map()
+            gm.current_map.draw(screen, gm.player.camera)
+            elapsed = time.perf_counter() - start
+            # The very first frame loads the start map, it is neither
+            if frame == 0 and door > 0:
+                transitions.append(elapsed)
+            elif door > 0 or frame > 0:
+                others.append(elapsed)
+            # Idle until the next frame like the game loop, the preloader works meanwhile
+            deadline += FRAME
+            time.sleep(max(deadline - time.perf_counter(), 0))
+        gm.switch_map(keys[(keys.index(gm.current_map_key) + 1) % len(keys)])
+    return transitions, others, gm
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--maps", type=int, default=6)
+    parser.add_argument("--size", type=int, default=120)
+    parser.add_argument("--doors", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=60)
+    args = parser.parse_args()
+
+    pg.init()
+    screen = pg.display.set_mode((GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT))
+    GameSettings.DRAW_HITBOXES = False
+    with tempfile.TemporaryDirectory() as tmp:
+        GameSettings.MAP_CACHE_DIR = os.path.join(tmp, "cache")
+        save = write_world(tmp, args.maps, args.size)
+        # Fill the map cache
+        GameSettings.MAP_PRELOAD = False
+        walk(save, screen, args.maps + 1, 1)
+
+        print(f"{args.maps} maps of {args.size}x{args.size} tiles in a ring, {args.doors} doors, "
+              f"{args.frames} frames per map, MAX_LOADED_MAPS={GameSettings.MAX_LOADED_MAPS}")
+        print(f"  {'':<11}{'transition ms':>14}{'worst':>8}{'other frames ms':>17}{'worst':>8}{'hit rate':>10}")
+        for preload in (False, True):
+            GameSettings.MAP_PRELOAD = preload
+            transitions, others, gm = walk(save, screen, args.doors, args.frames)
+            hits = f"{gm.map_preloader.hits}/{gm.map_preloader.hits + gm.map_preloader.misses}" if preload else "-"
+            print(f"  {'preload' if preload else 'no preload':<11}"
+                  f"{sum(transitions) / len(transitions) * 1000:>14.2f}{max(transitions) * 1000:>8.2f}"
+                  f"{sum(others) / len(others) * 1000:>17.2f}{max(others) * 1000:>8.2f}{hits:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+'''
+Map rendering: one prebaked surface for the whole map vs chunks baked on
+demand and culled to the camera.
+
+For assets/maps/map.tmx it times the old whole-map bake and blit against
+the chunked Map. Then it writes a synthetic --size x --size tile map (with
+the real tileset) and walks the camera across it. The old approach cannot
+even allocate that one (its size is printed), while the chunked map keeps
+at most MAX_CHUNKS chunks and a frame costs the same as on a small map.
+
+Run from the project root:
+    python -m benchmarks.bench_map_render [--size 500] [--frames 600]
+'''
+import argparse
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame as pg
+import pytmx
+
+from src.maps import Map
+from src.maps.map import CHUNK_TILES, MAX_CHUNKS
+from src.utils import GameSettings, Position, PositionCamera, load_tmx
+
+TILESET = os.path.abspath("assets/maps/tileset.tsx")
+# gids from map.tmx: grass floor, and a few decorations for a sparse layer
+FLOOR_GIDS = (109, 681)
+DECOR_GIDS = (573, 574, 575, 682)
+
+
+def write_synthetic_tmx(path: str, size: int, rng: random.Random) -> None:
+    def layer(layer_id: int, name: str, pick) -> str:
+        rows = (",".join(str(pick()) for _ in range(size)) for _ in range(size))
+        return (f' <layer id="{layer_id}" name="{name}" width="{size}" height="{size}">\n'
+                f'  <data encoding="csv">\n' + ",\n".join(rows) + "\n  </data>\n </layer>\n")
+
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                f'<map version="1.10" orientation="orthogonal" renderorder="right-down" width="{size}" '
+                f'height="{size}" tilewidth="16" tileheight="16" infinite="0" nextlayerid="3" nextobjectid="1">\n'
+                f' <tileset firstgid="1" source="{TILESET}"/>\n')
+        f.write(layer(1, "Floor", lambda: rng.choice(FLOOR_GIDS)))
+        f.write(layer(2, "Decorative", lambda: rng.choice(DECOR_GIDS) if rng.random() < 0.1 else 0))
+        f.write("</map>\n")
+
+
+def whole_map_surface(tmx: pytmx.TiledMap) -> pg.Surface:
+    # Map.__init__ before chunking
+    tile = GameSettings.TILE_SIZE
+    surface = pg.Surface((tmx.width * tile, tmx.height * tile), pg.SRCALPHA)
+    for layer in tmx.visible_layers:
+        if isinstance(layer, pytmx.TiledTileLayer):
+            for x, y, gid in layer:
+                image = tmx.get_tile_image_by_gid(gid) if gid else None
+                if image is not None:
+                    surface.blit(pg.transform.scale(image, (tile, tile)), (x * tile, y * tile))
+    return surface
+
+
+def walk(m: Map, screen: pg.Surface, frames: int, step: int | None = None) -> tuple[float, float]:
+    '''
+    Camera sweeps the map diagonally, or walks `step` px per frame from the
+    middle of the map; returns (mean, worst) frame time.
+    '''
+    tile = GameSettings.TILE_SIZE
+    span_x = max(m.width * tile - screen.get_width(), 1)
+    span_y = max(m.height * tile - screen.get_height(), 1)
+    times = []
+    for i in range(frames):
+        if step is None:
+            camera = PositionCamera(span_x * i // frames, span_y * i // frames)
+        else:
+            camera = PositionCamera(span_x // 2 + step * i, span_y // 2)
+        start = time.perf_counter()
+        m.draw(screen, camera)
+        times.append(time.perf_counter() - start)
+    return sum(times) / len(times), max(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--frames", type=int, default=600)
+    args = parser.parse_args()
+
+    pg.init()
+    screen = pg.display.set_mode((GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT))
+    GameSettings.DRAW_HITBOXES = False
+    tile = GameSettings.TILE_SIZE
+    chunk_bytes = (CHUNK_TILES * tile) ** 2 * 4
+
+    m = Map("map.tmx", [], Position(0, 0))
+    start = time.perf_counter()
+    full = whole_map_surface(load_tmx("map.tmx"))
+    bake = time.perf_counter() - start
+    span_x = full.get_width() - screen.get_width()
+    span_y = full.get_height() - screen.get_height()
+    start = time.perf_counter()
+    for i in range(args.frames):
+        screen.blit(full, (-(span_x * i // args.frames), -(span_y * i // args.frames)))
+    whole_blit = (time.perf_counter() - start) / args.frames
+    print(f"map.tmx {m.width}x{m.height} tiles")
+    print(f"  whole surface  bake {bake * 1000:7.1f} ms  {full.get_width() * full.get_height() * 4 / 2**20:7.1f} MiB"
+          f"  blit {whole_blit * 1000:.2f} ms/frame")
+    mean, worst = walk(m, screen, args.frames)
+    print(f"  chunks         {len(m._chunks)} baked       {len(m._chunks) * chunk_bytes / 2**20:7.1f} MiB"
+          f"  draw {mean * 1000:.2f} ms/frame (worst {worst * 1000:.1f} ms, includes baking)")
+    mean, _ = walk(m, screen, args.frames)
+    print(f"  chunks, warm   draw {mean * 1000:.2f} ms/frame")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.tmx")
+        write_synthetic_tmx(path, args.size, random.Random(0))
+        # Keep its cache entry out of the project's cache
+        GameSettings.MAP_CACHE_DIR = tmp
+        start = time.perf_counter()
+        big = Map(path, [], Position(0, 0))
+        load = time.perf_counter() - start
+        whole = (args.size * tile) ** 2 * 4
+        print(f"synthetic {args.size}x{args.size} tiles (tmx loaded in {load:.1f} s)")
+        print(f"  whole surface  would need {whole / 2**30:.1f} GiB")
+        mean, worst = walk(big, screen, args.frames)
+        print(f"  chunks         {len(big._chunks)} kept (max {MAX_CHUNKS}), "
+              f"{len(big._chunks) * chunk_bytes / 2**20:.1f} MiB"
+              f"  draw {mean * 1000:.2f} ms/frame (worst {worst * 1000:.1f} ms, includes baking)")
+        mean, worst = walk(big, screen, args.frames, step=4)
+        print(f"  chunks, walking 4 px/frame  draw {mean * 1000:.2f} ms/frame (worst {worst * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+'''
+Memory of the column store vs one dataclass instance per player.
+
+Run from the project root:
+    python -m benchmarks.bench_player_store [--players 100000]
+'''
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from server.playerHandler import Player, PlayerHandler
+from server.playerStore import PlayerStore
+
+MAPS = ["map.tmx", "gym.tmx", "store.tmx"]
+
+
+def measure(label: str, build, n: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    keep = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<34} {size / 2**20:8.2f} MiB  {size / n:7.1f} B/player  built in {elapsed:.2f} s")
+    del keep
+    return size
+
+
+def dataclass_store(n: int, rng: random.Random) -> dict[int, Player]:
+    now = time.monotonic()
+    players = {}
+    for pid in range(n):
+        players[pid] = Player(pid, rng.uniform(0, 4000), rng.uniform(0, 4000), rng.choice(MAPS), now)
+    return players
+
+
+def column_store(n: int, rng: random.Random) -> PlayerStore:
+    now = time.monotonic()
+    store = PlayerStore()
+    for pid in range(n):
+        slot = store.add(pid, 0, now)
+        store.update(slot, rng.uniform(0, 4000), rng.uniform(0, 4000), rng.randrange(len(MAPS)), 0, 0.0, 0.0, now)
+    return store
+
+
+def player_handler(n: int, rng: random.Random) -> PlayerHandler:
+    handler = PlayerHandler()
+    for _ in range(n):
+        pid = handler.register()
+        handler.update(pid, rng.uniform(0, 4000), rng.uniform(0, 4000), rng.choice(MAPS))
+    return handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.players
+
+    print(f"{n} players")
+    before = measure("dict of Player dataclasses", lambda: dataclass_store(n, random.Random(0)), n)
+    after = measure("PlayerStore columns", lambda: column_store(n, random.Random(0)), n)
+    print(f"  store is x{before / after:.1f} smaller")
+    measure("PlayerHandler (logs, heap, grid)", lambda: player_handler(n, random.Random(0)), n)
+
+
+if __name__ == "__main__":
+    main()
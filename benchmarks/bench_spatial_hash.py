@@ -0,0 +1,80 @@
+'''
+/players/near with the spatial hash vs filtering every player on the map.
+
+Puts --players players on one 500 x 500 tile map and asks for the players
+within one screen (radius 700 px) of random points, first through
+PlayerHandler.near(), then by checking the distance of every player on the
+map like a plain snapshot-and-filter would. Also reports what keeping the
+grid up to date costs per update.
+
+Run from the project root:
+    python -m benchmarks.bench_spatial_hash [--players 1000,10000,50000]
+'''
+import argparse
+import random
+import time
+
+from server.playerHandler import PlayerHandler
+from server.spatialHash import TILE_SIZE
+
+MAP = "map.tmx"
+MAP_PIXELS = 500 * TILE_SIZE
+RADIUS = 700.0
+QUERIES = 2000
+
+
+def build(n: int, rng: random.Random) -> PlayerHandler:
+    handler = PlayerHandler()
+    for _ in range(n):
+        pid = handler.register()
+        handler.update(pid, rng.uniform(0, MAP_PIXELS), rng.uniform(0, MAP_PIXELS), MAP)
+    return handler
+
+
+def scan(handler: PlayerHandler, x: float, y: float, r: float) -> list[int]:
+    players = handler.snapshot(MAP)["players"]
+    r2 = r * r
+    return [pid for pid, p in players.items() if (p["x"] - x) ** 2 + (p["y"] - y) ** 2 <= r2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", default="1000,10000,50000")
+    args = parser.parse_args()
+
+    print(f"500 x 500 tile map, radius {RADIUS:g} px, {QUERIES} queries")
+    print(f"  {'players':>8}{'in range':>10}{'near us':>10}{'scan us':>11}{'update us':>11}")
+    for n in (int(v) for v in args.players.split(",")):
+        rng = random.Random(0)
+        handler = build(n, rng)
+        points = [(rng.uniform(0, MAP_PIXELS), rng.uniform(0, MAP_PIXELS)) for _ in range(QUERIES)]
+
+        found = 0
+        start = time.perf_counter()
+        for x, y in points:
+            found += len(handler.near(MAP, x, y, RADIUS)["players"])
+        near_time = (time.perf_counter() - start) / QUERIES
+
+        scan_points = points[:max(1, QUERIES * 1000 // n)]
+        start = time.perf_counter()
+        for x, y in scan_points:
+            scan(handler, x, y, RADIUS)
+        scan_time = (time.perf_counter() - start) / len(scan_points)
+
+        for x, y in points[:20]:
+            assert sorted(handler.near(MAP, x, y, RADIUS)["players"]) == sorted(scan(handler, x, y, RADIUS))
+
+        # Small steps, mostly within the same cell, like walking players
+        moves = [(rng.randrange(n), rng.uniform(-8, 8), rng.uniform(-8, 8)) for _ in range(20000)]
+        start = time.perf_counter()
+        for pid, dx, dy in moves:
+            p = handler.get(pid)
+            handler.update(pid, p.x + dx, p.y + dy, MAP)
+        update_time = (time.perf_counter() - start) / len(moves)
+
+        print(f"  {n:>8}{found / QUERIES:>10.1f}{near_time * 1e6:>10.1f}{scan_time * 1e6:>11.1f}"
+              f"{update_time * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
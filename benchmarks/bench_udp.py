@@ -0,0 +1,178 @@
+'''
+Position updates over HTTP keep-alive POSTs vs UDP datagrams.
+
+Starts `server.py --mode async --udp-port` with the given simulated loss,
+registers --clients players and lets each send --rate updates per second,
+first as binary POST /players on one keep-alive connection per client, then
+as UDP datagrams. Reports the server CPU per update and how stale the
+server's view of the players is, sampled with GET /players every 100 ms
+(the age of the newest update the server shows for each player).
+
+Run from the project root:
+    python -m benchmarks.bench_udp [--clients 50] [--rate 20] [--loss 0.05]
+'''
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.loadtest import free_port, percentile, process_cpu_seconds
+from server import protocol
+
+SAMPLE_INTERVAL = 0.1
+
+
+class Connection:
+    '''One keep-alive HTTP/1.1 connection.'''
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+    @classmethod
+    async def open(cls, port: int) -> "Connection":
+        conn = cls()
+        conn.reader, conn.writer = await asyncio.open_connection("127.0.0.1", port)
+        return conn
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json") -> tuple[int, bytes]:
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length) if length else b""
+        return int(lines[0].split()[1]), payload
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class Phase:
+    '''Sends updates for every client over one transport and samples staleness.'''
+    def __init__(self, port: int, udp_port: int, pids: list[int], map_index: int, args: argparse.Namespace):
+        self.port = port
+        self.udp_port = udp_port
+        self.pids = pids
+        self.map_index = map_index
+        self.args = args
+        # pid -> send time of each sequence number, x carries the sequence number
+        self.sent: dict[int, dict[int, float]] = {pid: {} for pid in pids}
+        self.staleness: list[float] = []
+        self.updates = 0
+
+    async def run(self, transport: str) -> None:
+        deadline = time.monotonic() + self.args.duration
+        senders = [self._send_http(pid, deadline) if transport == "http" else self._send_udp(pid, deadline)
+                   for pid in self.pids]
+        await asyncio.gather(*senders, self._sample(deadline))
+
+    def _next(self, pid: int, seq: int) -> bytes:
+        x = seq % protocol.MAX_COORD
+        self.sent[pid][x] = time.monotonic()
+        self.updates += 1
+        return protocol.encode_updates([(pid, x, 0, self.map_index, 0, 0, 0)])
+
+    async def _send_http(self, pid: int, deadline: float) -> None:
+        conn = await Connection.open(self.port)
+        seq = 0
+        try:
+            while time.monotonic() < deadline:
+                seq += 1
+                await conn.request("POST", "/players", self._next(pid, seq), protocol.CONTENT_TYPE)
+                await asyncio.sleep(1 / self.args.rate)
+        finally:
+            conn.close()
+
+    async def _send_udp(self, pid: int, deadline: float) -> None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect(("127.0.0.1", self.udp_port))
+        seq = 0
+        try:
+            while time.monotonic() < deadline:
+                seq += 1
+                record = self._next(pid, seq)
+                sock.send(protocol.DATAGRAM_HEADER.pack(protocol.PROTOCOL_VERSION, seq) + record)
+                await asyncio.sleep(1 / self.args.rate)
+        finally:
+            sock.close()
+
+    async def _sample(self, deadline: float) -> None:
+        conn = await Connection.open(self.port)
+        await asyncio.sleep(1.0)
+        try:
+            while time.monotonic() < deadline:
+                _, payload = await conn.request("GET", "/players?map=bench.tmx")
+                now = time.monotonic()
+                for key, p in json.loads(payload)["players"].items():
+                    sent_at = self.sent.get(int(key), {}).get(int(p["x"]))
+                    if sent_at is not None:
+                        self.staleness.append(now - sent_at)
+                await asyncio.sleep(SAMPLE_INTERVAL)
+        finally:
+            conn.close()
+
+
+async def setup(port: int, clients: int) -> tuple[list[int], int]:
+    conn = await Connection.open(port)
+    pids = []
+    for _ in range(clients):
+        _, payload = await conn.request("GET", "/register")
+        pids.append(json.loads(payload)["id"])
+    # One JSON update adds the map to the server's map table
+    body = json.dumps({"id": pids[0], "x": 0, "y": 0, "map": "bench.tmx"}).encode()
+    await conn.request("POST", "/players", body)
+    _, payload = await conn.request("GET", "/maps")
+    conn.close()
+    return pids, json.loads(payload)["maps"].index("bench.tmx")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=20.0, help="updates per second per client")
+    parser.add_argument("--duration", type=float, default=8.0)
+    parser.add_argument("--loss", type=float, default=0.05, help="simulated datagram loss on the server")
+    args = parser.parse_args()
+
+    port, udp_port = free_port(), free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", "--mode", "async", "--port", str(port),
+         "--udp-port", str(udp_port), "--udp-loss", str(args.loss)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+        pids, map_index = asyncio.run(setup(port, args.clients))
+
+        print(f"{args.clients} clients x {args.rate:g} updates/s, {args.loss:.0%} simulated UDP loss")
+        print(f"  {'transport':<10}{'updates':>9}{'cpu us/update':>15}{'stale p50 ms':>14}{'stale p99 ms':>14}")
+        for transport in ("http", "udp"):
+            phase = Phase(port, udp_port, pids, map_index, args)
+            cpu_start = process_cpu_seconds(proc.pid)
+            asyncio.run(phase.run(transport))
+            cpu = process_cpu_seconds(proc.pid) - cpu_start
+            print(
+                f"  {transport:<10}{phase.updates:>9}{cpu / max(phase.updates, 1) * 1e6:>15.1f}"
+                f"{percentile(phase.staleness, 0.50) * 1000:>14.1f}{percentile(phase.staleness, 0.99) * 1000:>14.1f}"
+            )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
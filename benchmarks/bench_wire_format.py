@@ -0,0 +1,75 @@
+'''
+JSON vs binary wire format for /players.
+
+Run from the project root:
+    python -m benchmarks.bench_wire_format [--players 200]
+'''
+import argparse
+import json
+import random
+import timeit
+
+from server import protocol
+
+MAPS = ["map.tmx", "gym.tmx", "store.tmx"]
+
+
+def make_snapshot(n: int) -> dict:
+    rng = random.Random(0)
+    players = {}
+    for pid in range(n):
+        players[pid] = {
+            "id": pid,
+            "x": rng.uniform(0, 64 * 60),
+            "y": rng.uniform(0, 64 * 40),
+            "map": rng.choice(MAPS),
+            "dir": rng.randint(1, 4),
+            "vx": rng.choice((-320.0, 0.0, 320.0)),
+            "vy": 0.0,
+        }
+    return {"version": 12345, "full": True, "players": players, "removed": []}
+
+
+def measure(label: str, encode, decode, number: int) -> tuple[int, float, float]:
+    payload = encode()
+    enc = min(timeit.repeat(encode, number=number, repeat=5)) / number
+    dec = min(timeit.repeat(lambda: decode(payload), number=number, repeat=5)) / number
+    print(f"  {label:<8} {len(payload):>8} B   encode {enc * 1e6:9.2f} us   decode {dec * 1e6:9.2f} us")
+    return len(payload), enc, dec
+
+
+def compare(title: str, json_pair, binary_pair, number: int) -> None:
+    print(title)
+    j = measure("json", *json_pair, number=number)
+    b = measure("binary", *binary_pair, number=number)
+    print(f"  ratio    size x{j[0] / b[0]:.1f}   encode x{j[1] / b[1]:.1f}   decode x{j[2] / b[2]:.1f}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200)
+    args = parser.parse_args()
+
+    update = {"id": 42, "x": 1534.25, "y": 917.5, "map": "gym.tmx", "dir": 2, "vx": 320.0, "vy": 0.0}
+    compare(
+        "single position update (POST /players body)",
+        (lambda: json.dumps(update).encode("utf-8"),
+         lambda b: json.loads(b.decode("utf-8"))),
+        (lambda: protocol.encode_updates([(42, 1534.25, 917.5, 1, 2, 320.0, 0.0)]),
+         protocol.decode_updates),
+        number=20000,
+    )
+
+    snapshot = make_snapshot(args.players)
+    compare(
+        f"snapshot with {args.players} players (GET /players response)",
+        (lambda: json.dumps(snapshot).encode("utf-8"),
+         lambda b: json.loads(b.decode("utf-8"))),
+        (lambda: protocol.encode_snapshot(snapshot, MAPS),
+         protocol.decode_snapshot),
+        number=200,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+'''
+Load generator for the online server.
+
+Every simulated client follows the OnlineManager cycle: GET /register once,
+then POST /players at --update-rate and GET /players?map=&since= every
+--poll-interval seconds. Clients run as asyncio tasks, so a single process
+can drive thousands of them. By default every request opens a new
+connection; --keep-alive gives the send and fetch loop of each client one
+persistent connection each, like the per-thread sessions of OnlineManager.
+
+Run from the project root against a server it starts itself:
+    python -m benchmarks.loadtest --spawn async --clients 200 --duration 10
+or against a server that is already running:
+    python -m benchmarks.loadtest --url http://localhost:8989 --server-pid 1234
+
+Against a map-sharded server (--spawn shard starts a router and one worker
+per map) clients look up /shards and talk to the worker of their map, and
+the server CPU is summed over all worker processes. Use --processes to split
+the clients over several load generator processes so the generator itself
+does not become the bottleneck:
+    python -m benchmarks.loadtest --spawn shard --processes 3 --clients 600
+'''
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+MAPS = ["map.tmx", "gym.tmx", "store.tmx"]
+
+
+@dataclass
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    attempts: int = 0
+    errors: int = 0
+    bytes_in: int = 0
+    connects: int = 0
+
+
+class Target:
+    host: str
+    port: int
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 80
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json") -> tuple[int, bytes]:
+        # One connection per request, like bare requests.get / requests.post
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            head = (
+                f"{method} {path} HTTP/1.1\r\n"
+                f"Host: {self.host}:{self.port}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        status = int(status_line.split()[1])
+        _, _, payload = raw.partition(b"\r\n\r\n")
+        return status, payload
+
+
+class Connection:
+    '''A keep-alive connection to a Target that reconnects once when the server closed it.'''
+    target: Target
+    stats: RouteStats
+    _reader: asyncio.StreamReader | None
+    _writer: asyncio.StreamWriter | None
+
+    def __init__(self, target: Target, stats: RouteStats):
+        self.target = target
+        self.stats = stats
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      content_type: str = "application/json") -> tuple[int, bytes]:
+        for attempt in range(2):
+            if self._writer is None:
+                self.stats.connects += 1
+                self._reader, self._writer = await asyncio.open_connection(self.target.host, self.target.port)
+            try:
+                return await self._exchange(method, path, body, content_type)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    async def _exchange(self, method: str, path: str, body: bytes, content_type: str) -> tuple[int, bytes]:
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.target.host}:{self.target.port}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+        )
+        self._writer.write(head.encode("latin-1") + body)
+        await self._writer.drain()
+        lines = (await self._reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        length = 0
+        keep_alive = True
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value)
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        payload = await self._reader.readexactly(length) if length else b""
+        if not keep_alive:
+            self.close()
+        return int(lines[0].split()[1]), payload
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class LoadTest:
+    target: Target
+    stats: dict[str, RouteStats]
+    # map -> worker of a sharded server
+    shard_targets: dict[str, Target]
+
+    def __init__(self, target: Target, args: argparse.Namespace, shard_targets: dict[str, Target] | None = None):
+        self.target = target
+        self.args = args
+        self.stats = {route: RouteStats() for route in ("register", "update", "fetch")}
+        self.shard_targets = shard_targets or {}
+        self._deadline = 0.0
+
+    async def _timed(self, route: str, method: str, path: str, body: bytes = b"",
+                     target: Target | Connection | None = None) -> bytes | None:
+        stats = self.stats[route]
+        stats.attempts += 1
+        if not isinstance(target, Connection):
+            stats.connects += 1
+        start = time.perf_counter()
+        try:
+            request = (target or self.target).request(method, path, body)
+            status, payload = await asyncio.wait_for(request, 10)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            stats.errors += 1
+            if isinstance(target, Connection):
+                target.close()
+            return None
+        stats.latencies.append(time.perf_counter() - start)
+        stats.bytes_in += len(payload)
+        if status not in (200, 204, 304):
+            stats.errors += 1
+            return None
+        return payload
+
+    async def _client(self, index: int) -> None:
+        rng = random.Random(index)
+        await asyncio.sleep(rng.uniform(0, self.args.ramp_up))
+        payload = await self._timed("register", "GET", "/register")
+        if payload is None:
+            return
+        pid = json.loads(payload)["id"]
+        map_name = MAPS[index % len(MAPS)]
+        target = self.shard_targets.get(map_name, self.target)
+        x, y = rng.uniform(0, 3000), rng.uniform(0, 2000)
+
+        async def send_loop() -> None:
+            nonlocal x, y
+            conn = Connection(target, self.stats["update"]) if self.args.keep_alive else target
+            interval = 1.0 / self.args.update_rate
+            while time.monotonic() < self._deadline:
+                x += rng.uniform(-5, 5)
+                y += rng.uniform(-5, 5)
+                body = json.dumps({"id": pid, "x": x, "y": y, "map": map_name, "dir": 2}).encode()
+                await self._timed("update", "POST", "/players", body, conn)
+                await asyncio.sleep(interval)
+            if isinstance(conn, Connection):
+                conn.close()
+
+        async def fetch_loop() -> None:
+            conn = Connection(target, self.stats["fetch"]) if self.args.keep_alive else target
+            version = -1
+            while time.monotonic() < self._deadline:
+                path = f"/players?map={map_name}"
+                if version >= 0:
+                    path += f"&since={version}"
+                payload = await self._timed("fetch", "GET", path, target=conn)
+                if payload:
+                    version = json.loads(payload).get("version", -1)
+                await asyncio.sleep(self.args.poll_interval)
+            if isinstance(conn, Connection):
+                conn.close()
+
+        await asyncio.gather(send_loop(), fetch_loop())
+
+    async def run(self, indices: range) -> float:
+        self._deadline = time.monotonic() + self.args.ramp_up + self.args.duration
+        start = time.monotonic()
+        await asyncio.gather(*(self._client(i) for i in indices))
+        return time.monotonic() - start
+
+    def merge(self, stats: dict[str, RouteStats]) -> None:
+        for route, other in stats.items():
+            mine = self.stats[route]
+            mine.latencies += other.latencies
+            mine.attempts += other.attempts
+            mine.errors += other.errors
+            mine.bytes_in += other.bytes_in
+            mine.connects += other.connects
+
+
+def fetch_shards(url: str) -> list[dict]:
+    # A plain server answers /shards with 404
+    async def get() -> tuple[int, bytes]:
+        return await Target(url).request("GET", "/shards")
+    status, payload = asyncio.run(get())
+    return json.loads(payload)["shards"] if status == 200 else []
+
+
+def _run_worker(url: str, args: argparse.Namespace, shards: list[dict], indices: range):
+    shard_targets = {m: Target(shard["url"]) for shard in shards for m in shard["maps"]}
+    test = LoadTest(Target(url), args, shard_targets)
+    elapsed = asyncio.run(test.run(indices))
+    return elapsed, test.stats
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def process_cpu_seconds(pid: int) -> float | None:
+    # utime + stime from /proc (Linux only)
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(mode: str, port: int, tick_rate: float = 0) -> subprocess.Popen:
+    if mode == "shard":
+        # One worker per map on the ports right after the router
+        command = ["--host", "127.0.0.1"] + [arg for m in MAPS for arg in ("--shard", m)]
+    else:
+        command = ["--mode", mode]
+    if tick_rate:
+        command += ["--tick-rate", str(tick_rate)]
+    proc = subprocess.Popen(
+        [sys.executable, "server.py", *command, "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def report(test: LoadTest, elapsed: float, cpu: float | None, server_count: int) -> None:
+    args = test.args
+    servers = f", {server_count} server processes" if server_count > 1 else ""
+    servers += ", keep-alive" if args.keep_alive else ""
+    print(f"\n{args.clients} clients{servers}, {args.update_rate:g} updates/s, poll every {args.poll_interval * 1000:g} ms, {elapsed:.1f} s")
+    print(f"{'route':<10}{'requests':>10}{'req/s':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'KiB in':>10}")
+    total = attempts = errors = connects = 0
+    for route, stats in test.stats.items():
+        n = len(stats.latencies)
+        total += n
+        attempts += stats.attempts
+        errors += stats.errors
+        connects += stats.connects
+        print(
+            f"{route:<10}{n:>10}{n / elapsed:>10.0f}{stats.errors:>9}"
+            f"{percentile(stats.latencies, 0.50) * 1000:>10.2f}"
+            f"{percentile(stats.latencies, 0.95) * 1000:>10.2f}"
+            f"{percentile(stats.latencies, 0.99) * 1000:>10.2f}"
+            f"{stats.bytes_in / 1024:>10.0f}"
+        )
+    print(f"throughput {total / elapsed:.0f} req/s, error rate {errors / max(attempts, 1):.2%}, "
+          f"{connects / elapsed:.0f} new connections/s")
+    if cpu is not None:
+        print(f"server cpu {cpu:.2f} s ({cpu / elapsed:.0%} of one core, {os.cpu_count()} cores available)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8989")
+    parser.add_argument("--spawn", choices=("legacy", "async", "shard"), help="start a local server in this mode")
+    parser.add_argument("--tick-rate", type=float, default=0, help="fixed server tick for --spawn")
+    parser.add_argument("--server-pid", type=int, help="pid of a running server, for CPU accounting")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--update-rate", type=float, default=20.0, help="position updates per second per client")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="seconds between fetches per client")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of steady load")
+    parser.add_argument("--ramp-up", type=float, default=1.0, help="seconds over which clients start")
+    parser.add_argument("--keep-alive", action="store_true", help="reuse one connection per client loop")
+    parser.add_argument("--processes", type=int, default=1, help="load generator processes")
+    args = parser.parse_args()
+
+    proc = None
+    url = args.url
+    server_pid = args.server_pid
+    if args.spawn:
+        port = free_port()
+        proc = spawn_server(args.spawn, port, args.tick_rate)
+        url = f"http://127.0.0.1:{port}"
+        server_pid = proc.pid
+
+    try:
+        shards = fetch_shards(url)
+        server_pids = [server_pid] if server_pid else []
+        server_pids += [shard["pid"] for shard in shards if "pid" in shard]
+
+        cpu_start = [process_cpu_seconds(pid) for pid in server_pids]
+        test = LoadTest(Target(url), args)
+        if args.processes > 1:
+            chunks = [range(i, args.clients, args.processes) for i in range(args.processes)]
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.starmap(_run_worker, [(url, args, shards, chunk) for chunk in chunks])
+            elapsed = max(elapsed for elapsed, _ in results)
+            for _, stats in results:
+                test.merge(stats)
+        else:
+            elapsed, test.stats = _run_worker(url, args, shards, range(args.clients))
+        cpu_end = [process_cpu_seconds(pid) for pid in server_pids]
+
+        cpu = None
+        if server_pids and None not in cpu_start and None not in cpu_end:
+            cpu = sum(end - start for start, end in zip(cpu_start, cpu_end))
+        report(test, elapsed, cpu, max(len(server_pids) - (1 if shards else 0), 1))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,99 @@
 from server.playerHandler import PlayerHandler
+from server.routes import Router, Response
+from server.asyncServer import AsyncServer
+from server.sharding import ShardRouter, spawn_shards
+from server.udpChannel import UdpChannel
 
-from http.server import BaseHTTPRequestHandler, HTTPServer
-import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import signal
+import sys
 PORT = 8989
 
 PLAYER_HANDLER = PlayerHandler()
 PLAYER_HANDLER.start()
-    
+ROUTER = Router(PLAYER_HANDLER)
+
 class Handler(BaseHTTPRequestHandler):
+    # Keep connections open between requests; every response has a Content-Length
+    protocol_version = "HTTP/1.1"
+    # Close keep-alive connections idle for this many seconds
+    timeout = 30
+
     # def log_message(self, fmt, *args):
     #     return
 
     def do_GET(self):
-        if self.path == "/":
-            self._json(200, {"status": "ok"})
-            return
-            
-        if self.path == "/register":
-            pid = PLAYER_HANDLER.register()
-            self._json(200, {"message": "registration successful", "id": pid})
-            return
-
-        if self.path == "/players":
-            self._json(200, {"players": PLAYER_HANDLER.list_players()})
-            return
-
-        self._json(404, {"error": "not_found"})
+        self._send(ROUTER.handle_get(self.path, self._headers()))
 
     def do_POST(self):
-        if self.path != "/players":
-            self._json(404, {"error": "not_found"})
-            return
-
         length = int(self.headers.get("Content-Length", "0"))
-        try:
-            body = self.rfile.read(length)
-            data = json.loads(body.decode("utf-8"))
-        except Exception:
-            self._json(400, {"error": "invalid_json"})
-            return
+        body = self.rfile.read(length)
+        self._send(ROUTER.handle_post(self.path, self._headers(), body))
 
-        missing = [k for k in ("id", "x", "y", "map") if k not in data]
-        if missing:
-            self._json(400, {"error": "bad_fields", "missing": missing})
-            return
+    def _headers(self) -> dict[str, str]:
+        return {k.lower(): v for k, v in self.headers.items()}
 
-        try:
-            pid = int(data["id"])
-            x = float(data["x"])
-            y = float(data["y"])
-            map_name = str(data["map"])
-        except (ValueError, TypeError):
-            self._json(400, {"error": "bad_fields"})
-            return
+    # Utility for router responses
+    def _send(self, response: Response) -> None:
+        self.send_response(response.code)
+        self.send_header("Content-Type", response.content_type)
+        self.send_header("Content-Length", str(len(response.body)))
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(response.body)
 
-        ok = PLAYER_HANDLER.update(pid, x, y, map_name)
-        if not ok:
-            self._json(404, {"error": "player_not_found"})
-            return
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monster Go online position server")
+    parser.add_argument("--mode", choices=("legacy", "async"), default="legacy",
+                        help="legacy: thread-per-connection HTTPServer, async: asyncio server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--shard", action="append", metavar="MAPS",
+                        help="comma separated maps served by one worker process, repeat per worker; "
+                             "this process becomes the router and workers use the following ports")
+    parser.add_argument("--shard-worker", action="store_true",
+                        help="accept player ids handed out by a shard router")
+    parser.add_argument("--tick-rate", type=float, default=0,
+                        help="apply buffered updates this many times per second instead of immediately")
+    parser.add_argument("--udp-port", type=int, default=0,
+                        help="also accept position updates as UDP datagrams on this port")
+    parser.add_argument("--udp-loss", type=float, default=0.0,
+                        help="drop this fraction of incoming datagrams, to simulate a lossy network")
+    args = parser.parse_args()
 
-        self._json(200, {"success": True})
+    if args.shard:
+        groups = [[m for m in group.split(",") if m] for group in args.shard]
+        worker_args = ("--tick-rate", str(args.tick_rate)) if args.tick_rate else ()
+        shards, procs = spawn_shards(groups, args.host, "localhost", args.port, worker_args)
+        PLAYER_HANDLER.stop()
+        # terminate() of the router must also take the workers down
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print(f"[Server] Router on port {args.port} for {len(shards)} shard workers")
+        try:
+            AsyncServer(ShardRouter(shards), args.host, args.port).serve_forever()
+        finally:
+            for proc in procs:
+                proc.terminate()
+        sys.exit(0)
 
-    # Utility for JSON responses
-    def _json(self, code: int, obj: object) -> None:
-        data = json.dumps(obj).encode("utf-8")
-        self.send_response(code)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(data)))
-        self.end_headers()
-        self.wfile.write(data)
+    PLAYER_HANDLER.adopt_unknown = args.shard_worker
+    if args.tick_rate:
+        # Swap the cleaner thread for the tick thread
+        PLAYER_HANDLER.stop()
+        PLAYER_HANDLER.tick_rate = args.tick_rate
+        PLAYER_HANDLER.start()
+    if args.udp_port:
+        udp = UdpChannel(PLAYER_HANDLER, args.host, args.udp_port, args.udp_loss)
+        udp.start()
+        ROUTER.udp_port = udp.port
+        print(f"[Server] Position updates over UDP on port {udp.port}")
 
-if __name__ == "__main__":
-    print(f"[Server] Running on localhost with port {PORT}")
-    HTTPServer(("0.0.0.0", PORT), Handler).serve_forever()
+    tick = f", {args.tick_rate:g} Hz tick" if args.tick_rate else ""
+    print(f"[Server] Running on localhost with port {args.port} ({args.mode} mode{tick})")
+    if args.mode == "async":
+        AsyncServer(ROUTER, args.host, args.port).serve_forever()
+    else:
+        # One thread per connection, a keep-alive client would block a single-threaded server
+        ThreadingHTTPServer((args.host, args.port), Handler).serve_forever()
@@ -0,0 +1,200 @@
+import asyncio
+from http import HTTPStatus
+
+from server.routes import Router, Response, json_response, split_path
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+KEEP_ALIVE_TIMEOUT = 30.0
+STREAM_HEARTBEAT = 15.0
+
+
+class AsyncServer:
+    '''
+    Minimal HTTP/1.1 server on top of asyncio streams.
+
+    Every connection is a coroutine instead of a thread, so thousands of idle
+    keep-alive clients cost almost nothing and one slow reader never blocks
+    another client's POST. Requests are answered by the shared Router, so the
+    `/`, `/register` and `/players` contract is identical to the legacy server.
+
+    On top of that, `GET /players/stream` keeps the connection open and pushes
+    server-sent events whenever the PlayerHandler version moves.
+    '''
+    router: Router
+    host: str
+    port: int
+
+    _loop: asyncio.AbstractEventLoop | None
+    _changed: asyncio.Event | None   # replaced after every wake, streams wait on it
+    _wake_pending: bool
+
+    def __init__(self, router: Router, host: str = "0.0.0.0", port: int = 8989):
+        self.router = router
+        self.host = host
+        self.port = port
+
+        self._loop = None
+        self._changed = None
+        self._wake_pending = False
+
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        # A shard router keeps no players, so there is nothing to stream
+        if self.router.player_handler is not None:
+            self.router.player_handler.add_listener(self._on_players_changed)
+        server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port,
+            limit=MAX_HEADER_BYTES, backlog=4096
+        )
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._write(writer, json_response(431, {"error": "headers_too_large"}), False)
+                    return
+
+                try:
+                    method, path, version, headers = self._parse_head(head)
+                    length = int(headers.get("content-length", "0") or 0)
+                except ValueError:
+                    await self._write(writer, json_response(400, {"error": "bad_request"}), False)
+                    return
+
+                keep_alive = self._wants_keep_alive(version, headers)
+                if length < 0 or length > MAX_BODY_BYTES:
+                    await self._write(writer, json_response(413, {"error": "payload_too_large"}), False)
+                    return
+                body = await reader.readexactly(length) if length > 0 else b""
+
+                if (method == "GET" and split_path(path)[0] == "/players/stream"
+                        and self.router.player_handler is not None):
+                    await self._stream_players(writer, path)
+                    return
+                elif method == "GET":
+                    response = self.router.handle_get(path, headers)
+                elif method == "POST":
+                    response = self.router.handle_post(path, headers, body)
+                else:
+                    response = json_response(501, {"error": "unsupported_method"})
+
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    # Streaming
+    def _on_players_changed(self) -> None:
+        # May run on the cleaner thread; schedule at most one wake at a time
+        if self._wake_pending or self._loop is None:
+            return
+        self._wake_pending = True
+        self._loop.call_soon_threadsafe(self._wake_streams)
+
+    def _wake_streams(self) -> None:
+        self._wake_pending = False
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+    async def _stream_players(self, writer: asyncio.StreamWriter, path: str) -> None:
+        '''
+        Server-sent events with the same payload as `GET /players?since=`.
+        The first event is a full snapshot, later ones are deltas; the map
+        filter is resolved again on every wake so `?id=` follows the player
+        through doors (a new map starts over with a full snapshot). The
+        stream ends once that player is gone from this server.
+        Events come from PlayerHandler.encoded_scope(), keyed by the scope
+        version the stream last sent, so every stream on the same map shares
+        one encoded event per change.
+        '''
+        _, query = split_path(path)
+        handler = self.router.player_handler
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        version = -1
+        map_name = None
+        while True:
+            changed = self._changed
+            try:
+                current_map = self.router.resolve_map(query)
+            except ValueError:
+                return
+            if current_map is None and map_name is not None and "id" in query:
+                # The player left this server (shard handoff or expiry)
+                self._write_chunk(writer, b"")
+                await writer.drain()
+                return
+            since = version if current_map == map_name else -1
+            scope_version, body = handler.encoded_scope(current_map, since)
+            map_name = current_map
+            # Unchanged scope: the wake was for another map
+            if scope_version != since:
+                version = scope_version
+                self._write_chunk(writer, b"event: players\ndata: " + body + b"\n\n")
+                await writer.drain()
+            try:
+                await asyncio.wait_for(changed.wait(), STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                self._write_chunk(writer, b": ping\n\n")
+                await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, data: bytes) -> None:
+        # One HTTP chunk per event, so clients can hand each event over as soon as it arrives
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    @staticmethod
+    def _parse_head(head: bytes) -> tuple[str, str, str, dict[str, str]]:
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, version = lines[0].split(" ", 2)
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, path, version, headers
+
+    @staticmethod
+    def _wants_keep_alive(version: str, headers: dict[str, str]) -> bool:
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        try:
+            reason = HTTPStatus(response.code).phrase
+        except ValueError:
+            reason = ""
+        lines = [
+            f"HTTP/1.1 {response.code} {reason}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        for name, value in response.headers.items():
+            lines.append(f"{name}: {value}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + response.body)
+        await writer.drain()
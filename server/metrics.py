@@ -0,0 +1,167 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+# Upper bounds of the histogram buckets, the last bucket catches everything above
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    '''
+    Fixed-bucket histogram. Recording is a bisect and three additions with
+    no locking; concurrent writers may very rarely lose a sample, which is
+    fine for monitoring.
+    '''
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self) -> dict:
+        buckets = {str(bound): n for bound, n in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {"count": self.count, "sum": self.total, "buckets": buckets}
+
+
+class RouteMetrics:
+    __slots__ = ("requests", "status", "latency", "request_bytes", "response_bytes")
+
+    def __init__(self):
+        self.requests = 0
+        self.status: dict[int, int] = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "status": {str(code): n for code, n in self.status.items()},
+            "latency_seconds": self.latency.to_dict(),
+            "request_bytes": self.request_bytes.to_dict(),
+            "response_bytes": self.response_bytes.to_dict(),
+        }
+
+
+class Metrics:
+    '''
+    Server counters exposed on GET /metrics: per-route request counts,
+    latency and payload size histograms, time spent waiting for the
+    PlayerHandler lock and the duration of cleaner passes and ticks.
+    '''
+    routes: dict[str, RouteMetrics]
+    lock_wait: Histogram
+    cleaner_pass: Histogram
+    # Tick mode only: time per tick, updates applied per tick, and updates
+    # dropped because a newer one for the same player arrived in the same tick
+    # or because applying them raised
+    tick_duration: Histogram
+    tick_updates: Histogram
+    updates_coalesced: int
+    updates_failed: int
+
+    def __init__(self):
+        self.routes = {}
+        self.lock_wait = Histogram(LATENCY_BUCKETS)
+        self.cleaner_pass = Histogram(LATENCY_BUCKETS)
+        self.tick_duration = Histogram(LATENCY_BUCKETS)
+        self.tick_updates = Histogram(SIZE_BUCKETS)
+        self.updates_coalesced = 0
+        self.updates_failed = 0
+
+    def observe_request(self, route: str, status: int, seconds: float,
+                        request_bytes: int, response_bytes: int) -> None:
+        m = self.routes.get(route)
+        if m is None:
+            m = self.routes[route] = RouteMetrics()
+        m.requests += 1
+        m.status[status] = m.status.get(status, 0) + 1
+        m.latency.observe(seconds)
+        m.request_bytes.observe(request_bytes)
+        m.response_bytes.observe(response_bytes)
+
+    def to_dict(self, active_players: int) -> dict:
+        return {
+            "active_players": active_players,
+            "routes": {route: m.to_dict() for route, m in list(self.routes.items())},
+            "lock_wait_seconds": self.lock_wait.to_dict(),
+            "cleaner_pass_seconds": self.cleaner_pass.to_dict(),
+            "tick_seconds": self.tick_duration.to_dict(),
+            "tick_updates": self.tick_updates.to_dict(),
+            "updates_coalesced": self.updates_coalesced,
+            "updates_failed": self.updates_failed,
+        }
+
+    def to_text(self, active_players: int) -> str:
+        '''Prometheus text exposition format.'''
+        lines = [
+            "# TYPE server_active_players gauge",
+            f"server_active_players {active_players}",
+        ]
+        lines.append("# TYPE server_requests_total counter")
+        for route, m in list(self.routes.items()):
+            for code, n in list(m.status.items()):
+                lines.append(f'server_requests_total{{route="{route}",status="{code}"}} {n}')
+        for name, attr in (("server_request_latency_seconds", "latency"),
+                           ("server_request_bytes", "request_bytes"),
+                           ("server_response_bytes", "response_bytes")):
+            lines.append(f"# TYPE {name} histogram")
+            for route, m in list(self.routes.items()):
+                lines += _histogram_lines(name, getattr(m, attr), f'route="{route}"')
+        lines.append("# TYPE server_lock_wait_seconds histogram")
+        lines += _histogram_lines("server_lock_wait_seconds", self.lock_wait)
+        lines.append("# TYPE server_cleaner_pass_seconds histogram")
+        lines += _histogram_lines("server_cleaner_pass_seconds", self.cleaner_pass)
+        lines.append("# TYPE server_tick_seconds histogram")
+        lines += _histogram_lines("server_tick_seconds", self.tick_duration)
+        lines.append("# TYPE server_tick_updates histogram")
+        lines += _histogram_lines("server_tick_updates", self.tick_updates)
+        lines.append("# TYPE server_updates_coalesced_total counter")
+        lines.append(f"server_updates_coalesced_total {self.updates_coalesced}")
+        lines.append("# TYPE server_updates_failed_total counter")
+        lines.append(f"server_updates_failed_total {self.updates_failed}")
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, h: Histogram, labels: str = "") -> list[str]:
+    sep = "," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, n in zip(h.bounds, h.counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+    cumulative += h.counts[-1]
+    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {cumulative}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {h.total}")
+    lines.append(f"{name}_count{suffix} {h.count}")
+    return lines
+
+
+class TimedLock:
+    '''threading.Lock that records how long each acquisition waited.'''
+    __slots__ = ("_lock", "_histogram")
+
+    def __init__(self, histogram: Histogram):
+        self._lock = threading.Lock()
+        self._histogram = histogram
+
+    def __enter__(self) -> None:
+        start = perf_counter()
+        self._lock.acquire()
+        self._histogram.observe(perf_counter() - start)
+
+    def __exit__(self, *exc) -> None:
+        self._lock.release()
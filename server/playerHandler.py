@@ -1,54 +1,265 @@
+import sys
 import threading
 import time
 import copy
+import heapq
+import json
+from array import array
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Callable, Dict, Iterable, Optional
+
+from server import protocol
+from server.playerStore import PlayerStore
+from server.spatialHash import SpatialHash
+from server.metrics import Metrics, TimedLock
 
 TIMEOUT_TIME = 60.0
 CHECK_INTERVAL_TIME = 10.0
+# Removed players remembered for delta queries; older clients get a full snapshot
+MAX_TOMBSTONES = 4096
+# Stale change log entries tolerated beyond one per player before compacting
+COMPACT_SLACK = 64
+# Encoded /players responses kept around for readers asking the same question
+RESPONSE_CACHE_SIZE = 256
+# The map table never shrinks (binary clients cache the indices), so clients
+# cannot grow it without bound: names have to fit its u8 length prefix and
+# the table its u8 indices
+MAX_MAP_NAME = 0xFF
+MAX_MAPS = protocol.MAX_MAPS
+# Shard workers only adopt ids the wire formats and the store's "q" column can carry
+MAX_ID = protocol.MAX_ID
+
+# pid, x, y, map, direction, vx, vy
+Update = tuple[int, float, float, str, int, float, float]
+
+class MapTableError(ValueError):
+    '''An update names a map the map table cannot take.'''
+
+
+@dataclass(frozen=True)
+class TickState:
+    '''What the tick loop published last: readers between two ticks all see this.'''
+    tick: int
+    version: int
+    time: float
 
 @dataclass
 class Player:
+    '''A copy of one row of the PlayerStore, see PlayerHandler.get().'''
     id: int
     x: float
     y: float
     map: str
     last_update: float
+    dir: int = 0
+    vx: float = 0.0
+    vy: float = 0.0
 
-    def update(self, x: float, y: float, map: str) -> None:
-        if x != self.x or y != self.y or map != self.map:
+    def update(self, x: float, y: float, map: str, dir: int = 0, vx: float = 0.0, vy: float = 0.0) -> bool:
+        changed = (x != self.x or y != self.y or map != self.map or dir != self.dir
+                   or vx != self.vx or vy != self.vy)
+        if changed:
             self.last_update = time.monotonic()
         self.x = x
         self.y = y
         self.map = map
+        self.dir = dir
+        self.vx = vx
+        self.vy = vy
+        return changed
 
-    def is_inactive(self) -> bool:
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "x": self.x,
+            "y": self.y,
+            "map": self.map,
+            "dir": self.dir,
+            "vx": self.vx,
+            "vy": self.vy
+        }
+
+    def is_inactive(self, timeout: float = TIMEOUT_TIME) -> bool:
         now = time.monotonic()
-        return (now - self.last_update) >= TIMEOUT_TIME
+        return (now - self.last_update) >= timeout
+
+
+class ChangeLog:
+    '''
+    Ids that changed or left a scope (the whole world or one map), kept in
+    version order so "what happened since v" only walks the newest entries.
+
+    A change appends (pid, version) to two flat arrays rather than keeping a
+    dict entry per player. Each player's latest version is in the store's
+    changed_at column, so an entry is current only while it matches it (and,
+    for a map, while the player is still on that map); older entries are
+    skipped and compacted away once they outnumber the current ones.
+    '''
+    pids: array                        # changed ids, oldest change first
+    versions: array                    # version of each entry in pids
+    count: int                         # players currently in the scope
+    removed: "OrderedDict[int, int]"   # pid -> version it left the scope at
+    floor: int                         # queries older than this need a full snapshot
+    version: int                       # last version that changed anything in the scope
+    _store: PlayerStore | None
+    _map_id: int | None                # None for the whole world
+
+    def __init__(self, store: PlayerStore | None = None, map_id: int | None = None):
+        self.pids = array("q")
+        self.versions = array("Q")
+        self.count = 0
+        self.removed = OrderedDict()
+        self.floor = 0
+        self.version = 0
+        self._store = store
+        self._map_id = map_id
+
+    def touch(self, pid: int, version: int, joined: bool) -> None:
+        '''
+        Records a change; `joined` when the player was not in the scope
+        before. Call after the store's changed_at column has the version.
+        '''
+        if joined:
+            self.removed.pop(pid, None)
+            self.count += 1
+        self.pids.append(pid)
+        self.versions.append(version)
+        self.version = version
+        if len(self.pids) > 2 * self.count + COMPACT_SLACK:
+            self._compact()
+
+    def remove(self, pid: int, version: int) -> None:
+        self.count -= 1
+        self.removed[pid] = version
+        self.version = version
+        while len(self.removed) > MAX_TOMBSTONES:
+            _, removed_at = self.removed.popitem(last=False)
+            self.floor = removed_at
+
+    def members(self) -> list[int]:
+        '''Ids currently in the scope, least recently changed first.'''
+        return [pid for pid, _ in self._current(zip(self.pids, self.versions))]
+
+    def changed_since(self, since: int) -> list[int]:
+        pids, versions = self.pids, self.versions
+        newest_first = ((pids[i], versions[i]) for i in range(len(pids) - 1, -1, -1))
+        return [pid for pid, _ in self._current(newest_first, since)]
+
+    def removed_since(self, since: int) -> list[int]:
+        ids = []
+        for pid, removed_at in reversed(self.removed.items()):
+            if removed_at <= since:
+                break
+            ids.append(pid)
+        return ids
+
+    def _current(self, entries: Iterable[tuple[int, int]], since: int = -1):
+        '''The current entries, stopping at the first one not newer than `since`.'''
+        store = self._store
+        if store is None:
+            return
+        slot_of = store.slot
+        changed_at, maps = store.changed_at, store.maps
+        map_id = self._map_id
+        for pid, version in entries:
+            if version <= since:
+                return
+            slot = slot_of(pid)
+            if slot is not None and changed_at[slot] == version and (map_id is None or maps[slot] == map_id):
+                yield pid, version
+
+    def _compact(self) -> None:
+        pids, versions = array("q"), array("Q")
+        for pid, version in self._current(zip(self.pids, self.versions)):
+            pids.append(pid)
+            versions.append(version)
+        self.pids, self.versions = pids, versions
 
 
 class PlayerHandler:
-    _lock: threading.Lock
+    metrics: Metrics
+    _lock: TimedLock
     _stop_event: threading.Event
     _thread: threading.Thread | None
+
+    # Fixed-rate tick (None: apply every update as it arrives). Updates wait in
+    # _pending, latest per player, until the tick thread applies them in one batch.
+    tick_rate: float | None
+    published: TickState
+    _pending: dict[int, Update]
+    _pending_lock: threading.Lock
     
-    players: Dict[int, Player]
+    _store: PlayerStore
+    # Grid of player positions for /players/near, kept in step with the store
+    _grid: SpatialHash
     _next_id: int
 
-    def __init__(self, *, timeout_seconds: float = 120.0, check_interval_seconds: float = 5.0):
-        self._lock = threading.Lock()
+    timeout_seconds: float
+    check_interval_seconds: float
+    # Shard workers accept updates for ids handed out by the shard router
+    adopt_unknown: bool
+    # Lazy-deletion min-heap of (deadline, pid). Deadlines are only refreshed
+    # when they come due, so updates never touch the heap.
+    _expiry: list[tuple[float, int]]
+
+    # World version, bumped on every join, move and timeout
+    version: int
+    _world: ChangeLog
+    # Change log of each map: its current entries are exactly the players
+    # currently on that map
+    _maps: Dict[str, ChangeLog]
+    _map_logs: list[ChangeLog]
+    # Append-only map table; the store and the binary protocol use the index
+    _map_names: list[str]
+    _map_ids: Dict[str, int]
+    # Called (outside the lock) after the version moved, e.g. to wake streams
+    _listeners: list[Callable[[], None]]
+    # (map, since, format) -> (scope version, encoded body); an entry is dirty
+    # as soon as its scope's version moves on
+    _response_cache: "OrderedDict[tuple, tuple[int, bytes]]"
+    _encode_lock: threading.Lock
+
+    def __init__(self, *, timeout_seconds: float = TIMEOUT_TIME, check_interval_seconds: float = CHECK_INTERVAL_TIME,
+                 metrics: Metrics | None = None, adopt_unknown: bool = False, tick_rate: float | None = None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._lock = TimedLock(self.metrics.lock_wait)
         self._stop_event = threading.Event()
         self._thread = None
+
+        self.tick_rate = tick_rate
+        self.published = TickState(0, 0, time.monotonic())
+        self._pending = {}
+        self._pending_lock = threading.Lock()
         
-        self.players = {}
+        self._store = PlayerStore()
+        self._grid = SpatialHash()
         self._next_id = 0
+
+        self.timeout_seconds = timeout_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.adopt_unknown = adopt_unknown
+        self._expiry = []
+
+        self.version = 0
+        self._world = ChangeLog(self._store)
+        self._maps = {}
+        self._map_logs = []
+        self._map_names = []
+        self._map_ids = {}
+        self._listeners = []
+        self._response_cache = OrderedDict()
+        self._encode_lock = threading.Lock()
         
     # Threading
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
             return
         self._stop_event.clear()
-        self._thread = threading.Thread(target=self._cleaner, name="PlayerCleaner", daemon=True)
+        if self.tick_rate:
+            self._thread = threading.Thread(target=self._ticker, name="PlayerTicker", daemon=True)
+        else:
+            self._thread = threading.Thread(target=self._cleaner, name="PlayerCleaner", daemon=True)
         self._thread.start()
 
     def stop(self) -> None:
@@ -57,41 +268,419 @@ class PlayerHandler:
             self._thread.join(timeout=2.0)
 
     def _cleaner(self) -> None:
-        while not self._stop_event.wait(CHECK_INTERVAL_TIME):
+        while not self._stop_event.wait(self.check_interval_seconds):
+            start = time.perf_counter()
+            removed = self.expire(time.monotonic())
+            self.metrics.cleaner_pass.observe(time.perf_counter() - start)
+            if removed:
+                self._notify()
+
+    def _ticker(self) -> None:
+        interval = 1.0 / self.tick_rate
+        next_tick = time.monotonic() + interval
+        next_expiry = time.monotonic() + self.check_interval_seconds
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
             now = time.monotonic()
-            to_remove: list[int] = []
-            with self._lock:
-                for pid, p in list(self.players.items()):
-                    if now - p.last_update >= TIMEOUT_TIME:
-                        to_remove.append(pid)
-                for pid in to_remove:
-                    _ = self.players.pop(pid, None)
-                    
+            # A slow tick pushes the schedule back instead of running a burst of catch-up ticks
+            next_tick = max(next_tick + interval, now)
+            start = time.perf_counter()
+            # The thread is the only thing applying buffered updates, it must outlive a bad tick
+            try:
+                changed = self.run_tick(now)
+                if now >= next_expiry:
+                    next_expiry = now + self.check_interval_seconds
+                    changed = self.expire(now) or changed
+            except Exception as e:
+                print(f"[Server] Tick failed: {e!r}", file=sys.stderr)
+                changed = True
+            self.metrics.tick_duration.observe(time.perf_counter() - start)
+            if changed:
+                self._notify()
+
+    def run_tick(self, now: float | None = None) -> bool:
+        '''
+        Applies the updates buffered since the last tick in one batch and
+        publishes the next TickState. Returns whether any player changed.
+        An update that fails to apply is logged and dropped, the rest of the
+        batch still goes through.
+        '''
+        if now is None:
+            now = time.monotonic()
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        changed = False
+        failed = 0
+        with self._lock:
+            for update in pending.values():
+                try:
+                    if self._apply_locked(update, now):
+                        changed = True
+                except Exception as e:
+                    failed += 1
+                    print(f"[Server] Dropped update for player {update[0]}: {e!r}", file=sys.stderr)
+            self.published = TickState(self.published.tick + 1, self.version, now)
+        self.metrics.tick_updates.observe(len(pending))
+        self.metrics.updates_failed += failed
+        return changed
+
+    def expire(self, now: float) -> bool:
+        '''
+        Removes players idle for `timeout_seconds`. Only heap entries that are
+        due are popped: a player who moved since gets pushed back with the new
+        deadline, so a pass costs O(k log n) for the k due entries instead of
+        a scan over every player under the lock.
+        '''
+        removed = False
+        with self._lock:
+            heap = self._expiry
+            store = self._store
+            while heap and heap[0][0] <= now:
+                _, pid = heapq.heappop(heap)
+                slot = store.slot(pid)
+                if slot is None:
+                    continue
+                deadline = store.last_update[slot] + self.timeout_seconds
+                if deadline > now:
+                    heapq.heappush(heap, (deadline, pid))
+                    continue
+                self._mark_removed(pid, store.maps[slot])
+                store.remove(pid)
+                removed = True
+        return removed
+
+    # Change listeners
+    def add_listener(self, callback: Callable[[], None]) -> None:
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self) -> None:
+        for callback in self._listeners:
+            callback()
+
+    def _reserve_maps(self, names: Iterable[str]) -> None:
+        '''
+        Adds the maps not in the table yet, or raises MapTableError before
+        anything is applied when a name is too long or the table is full.
+        '''
+        # Known maps are the common case and need no lock
+        new = {name for name in names if name not in self._map_ids}
+        if not new:
+            return
+        with self._lock:
+            for name in new:
+                if name in self._map_ids:
+                    continue
+                if len(name.encode("utf-8")) > MAX_MAP_NAME:
+                    raise MapTableError("map name too long")
+                if len(self._map_names) >= MAX_MAPS:
+                    raise MapTableError("too many maps")
+                self._map_id(name)
+
+    # Change tracking, call with _lock held
+    def _map_id(self, map_name: str) -> int:
+        map_id = self._map_ids.get(map_name)
+        if map_id is None:
+            map_id = self._map_ids[map_name] = len(self._map_names)
+            log = ChangeLog(self._store, map_id)
+            self._map_names.append(map_name)
+            self._map_logs.append(log)
+            self._maps[map_name] = log
+        return map_id
+
+    def _mark_changed(self, slot: int, old_map: int | None, new_map: int) -> None:
+        # Call after the store row has its new map
+        self.version += 1
+        store = self._store
+        store.changed_at[slot] = self.version
+        pid = store.ids[slot]
+        self._world.touch(pid, self.version, old_map is None)
+        moved = old_map is not None and old_map != new_map
+        if moved:
+            self._map_logs[old_map].remove(pid, self.version)
+        self._map_logs[new_map].touch(pid, self.version, old_map is None or moved)
+
+    def _mark_removed(self, pid: int, map_id: int) -> None:
+        self._grid.remove(pid)
+        self.version += 1
+        self._world.remove(pid, self.version)
+        self._map_logs[map_id].remove(pid, self.version)
+
     # API
     def register(self) -> int:
         with self._lock:
             pid = self._next_id
             self._next_id += 1
-            self.players[pid] = Player(pid, 0.0, 0.0, "", time.monotonic())
-            return pid
+            self._add_locked(pid, time.monotonic())
+        self._notify()
+        return pid
 
-    def update(self, pid: int, x: float, y: float, map_name: str) -> bool:
+    def remove(self, pid: int) -> bool:
+        '''Drops a player right away, e.g. when they are handed off to another shard.'''
         with self._lock:
-            p = self.players.get(pid)
-            if not p:
+            slot = self._store.slot(pid)
+            if slot is None:
                 return False
-            else:
-                p.update(float(x), float(y), str(map_name))
-                return True
+            self._mark_removed(pid, self._store.maps[slot])
+            self._store.remove(pid)
+        self._notify()
+        return True
+
+    def update(self, pid: int, x: float, y: float, map_name: str, direction: int = 0,
+               vx: float = 0.0, vy: float = 0.0) -> bool:
+        update = (pid, float(x), float(y), str(map_name), int(direction), float(vx), float(vy))
+        self._reserve_maps((update[3],))
+        if self.tick_rate:
+            return not self._buffer((update,))
+        with self._lock:
+            changed = self._apply_locked(update, time.monotonic())
+        if changed:
+            self._notify()
+        return changed is not None
+
+    def update_many(self, updates: Iterable[Update]) -> list[int]:
+        '''
+        Applies (pid, x, y, map, direction, vx, vy) updates in order under a single
+        lock acquisition. Only the last update of each player is applied,
+        since positions are latest-wins. Returns the ids that are not
+        registered. Raises MapTableError, applying nothing, if a map cannot
+        be added to the map table.
+        '''
+        updates = [(pid, float(x), float(y), str(map_name), int(direction), float(vx), float(vy))
+                   for pid, x, y, map_name, direction, vx, vy in updates]
+        self._reserve_maps(update[3] for update in updates)
+        if self.tick_rate:
+            return self._buffer(updates)
+
+        latest: dict[int, Update] = {}
+        for update in updates:
+            latest[update[0]] = update
+
+        missing = []
+        any_changed = False
+        now = time.monotonic()
+        with self._lock:
+            for update in latest.values():
+                pid = update[0]
+                changed = self._apply_locked(update, now)
+                if changed is None:
+                    missing.append(pid)
+                elif changed:
+                    any_changed = True
+        if any_changed:
+            self._notify()
+        return missing
+
+    def _buffer(self, updates: Iterable[Update]) -> list[int]:
+        # Tick mode: keep the latest update per player until the next tick
+        missing = []
+        coalesced = 0
+        store = self._store
+        with self._pending_lock:
+            pending = self._pending
+            for update in updates:
+                pid = update[0]
+                if pid not in store and not self._adoptable(pid):
+                    missing.append(pid)
+                    continue
+                if pid in pending:
+                    coalesced += 1
+                pending[pid] = update
+        self.metrics.updates_coalesced += coalesced
+        return missing
+
+    def _adoptable(self, pid: int) -> bool:
+        return self.adopt_unknown and 0 <= pid <= MAX_ID
+
+    # Call with _lock held
+    def _add_locked(self, pid: int, now: float) -> int:
+        map_id = self._map_id("")
+        slot = self._store.add(pid, map_id, now)
+        self._grid.move(pid, map_id, 0.0, 0.0)
+        heapq.heappush(self._expiry, (now + self.timeout_seconds, pid))
+        self._mark_changed(slot, None, map_id)
+        return slot
+
+    # Call with _lock held. Returns None for an unknown player, else whether it changed
+    def _apply_locked(self, update: Update, now: float) -> bool | None:
+        pid, x, y, map_name, direction, vx, vy = update
+        store = self._store
+        slot = store.slot(pid)
+        if slot is None and not self._adoptable(pid):
+            return None
+        new_map = self._map_id(map_name)
+        # Before anything is written: for a position with no cell (inf, nan)
+        # this raises and leaves the store, grid and change logs as they were
+        cell = self._grid.cell(new_map, x, y)
+        if slot is None:
+            slot = self._add_locked(pid, now)
+        old_map = store.maps[slot]
+        changed = store.update(slot, x, y, new_map, direction, vx, vy, now)
+        if changed:
+            self._grid.place(pid, cell)
+            self._mark_changed(slot, old_map, new_map)
+        return changed
+
+    def get(self, pid: int) -> Player | None:
+        with self._lock:
+            store = self._store
+            slot = store.slot(pid)
+            if slot is None:
+                return None
+            return Player(pid, store.xs[slot], store.ys[slot], self._map_names[store.maps[slot]],
+                          store.last_update[slot], store.dirs[slot], store.vxs[slot], store.vys[slot])
+
+    def player_count(self) -> int:
+        return len(self._store)
+
+    def map_names(self) -> list[str]:
+        with self._lock:
+            return list(self._map_names)
+
+    def map_of(self, pid: int) -> str | None:
+        with self._lock:
+            slot = self._store.slot(pid)
+            return self._map_names[self._store.maps[slot]] if slot is not None else None
 
     def list_players(self) -> dict:
         with self._lock:
-            player_list = {}
-            for p in self.players.values():
-                player_list[p.id] = {
-                    "id": p.id,
-                    "x": p.x,
-                    "y": p.y,
-                    "map": p.map
-                }
-            return player_list
+            return self._players_dict(self._store.pids())
+
+    def snapshot(self, map_name: str | None = None) -> dict:
+        with self._lock:
+            return self._snapshot_locked(map_name)
+
+    def delta(self, since: int, map_name: str | None = None) -> dict:
+        '''
+        Players that joined, moved or left after `since`, optionally limited to
+        one map. A player who moved to another map shows up in "removed" for
+        the map they left.
+        Walks the change logs from the newest entry backwards, so the cost
+        depends on how many players changed, not on how many are online.
+        Falls back to a full snapshot ("full": True) when `since` is older than
+        the remembered history or newer than the current version.
+        '''
+        with self._lock:
+            return self._delta_locked(since, map_name)
+
+    def near(self, map_name: str, x: float, y: float, r: float) -> dict:
+        '''
+        Snapshot of the players on `map_name` within `r` pixels of (x, y).
+        Visits only the spatial hash cells around the circle, or the map's
+        players when the circle covers more cells than there are players.
+        '''
+        with self._lock:
+            map_id = self._map_ids.get(map_name)
+            ids = []
+            if map_id is not None:
+                log = self._map_logs[map_id]
+                if self._grid.cells_in_range(map_id, x, y, r) > log.count:
+                    candidates = log.members()
+                else:
+                    candidates = self._grid.query(map_id, x, y, r)
+                store = self._store
+                slot_of = store.slot
+                xs, ys = store.xs, store.ys
+                r2 = r * r
+                for pid in candidates:
+                    slot = slot_of(pid)
+                    dx = xs[slot] - x
+                    dy = ys[slot] - y
+                    if dx * dx + dy * dy <= r2:
+                        ids.append(pid)
+            data = self._with_tick({"version": self.version, "players": self._players_dict(ids)})
+        data["map"] = map_name
+        return data
+
+    def encoded_players(self, map_name: str | None, since: int | None, fmt: str = "json") -> tuple[str, bytes]:
+        '''
+        Returns (etag, body) for a /players response in `fmt` ("json" or
+        "binary"). The encoded bytes are cached until something changes on the
+        requested map, so every client polling the same question shares one
+        serialization per change. Raises ValueError if `fmt` cannot encode
+        the current data.
+        '''
+        scope_version, body = self.encoded_scope(map_name, since, fmt)
+        return f'"{scope_version}{fmt[0]}"', body
+
+    def encoded_scope(self, map_name: str | None, since: int | None, fmt: str = "json") -> tuple[int, bytes]:
+        '''
+        encoded_players() with the version of the requested scope, i.e. the
+        version of the last change on that map (or anywhere for None),
+        instead of an ETag. Asking again with that version as `since` gives
+        an empty delta until the scope changes.
+        '''
+        key = (map_name, since, fmt)
+        with self._encode_lock:
+            with self._lock:
+                scope_version = self._scope_log(map_name).version
+                cached = self._response_cache.get(key)
+                if cached is not None and cached[0] == scope_version:
+                    self._response_cache.move_to_end(key)
+                    return cached
+                if since is None:
+                    data = self._snapshot_locked(map_name)
+                else:
+                    data = self._delta_locked(since, map_name)
+                map_names = list(self._map_names)
+
+            # Encode outside the player lock so updates are not held up
+            if map_name is not None:
+                data["map"] = map_name
+            if fmt == "binary":
+                body = protocol.encode_snapshot(data, map_names)
+            else:
+                body = json.dumps(data).encode("utf-8")
+
+            self._response_cache[key] = (scope_version, body)
+            if len(self._response_cache) > RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
+            return scope_version, body
+
+    # Call with _lock held
+    def _scope_log(self, map_name: str | None) -> ChangeLog:
+        if map_name is None:
+            return self._world
+        return self._maps.get(map_name) or ChangeLog()
+
+    def _snapshot_locked(self, map_name: str | None) -> dict:
+        return self._with_tick({
+            "version": self.version,
+            "players": self._players_dict(self._scope_ids(map_name)),
+        })
+
+    def _delta_locked(self, since: int, map_name: str | None) -> dict:
+        log = self._scope_log(map_name)
+        if since < log.floor or since > self.version:
+            return self._with_tick({
+                "version": self.version,
+                "full": True,
+                "players": self._players_dict(self._scope_ids(map_name)),
+                "removed": [],
+            })
+
+        return self._with_tick({
+            "version": self.version,
+            "full": False,
+            "players": self._players_dict(log.changed_since(since)),
+            "removed": log.removed_since(since),
+        })
+
+    def _with_tick(self, data: dict) -> dict:
+        if self.tick_rate:
+            data["tick"] = self.published.tick
+        return data
+
+    def _scope_ids(self, map_name: str | None):
+        if map_name is None:
+            return self._store.pids()
+        log = self._maps.get(map_name)
+        return log.members() if log else ()
+
+    def _players_dict(self, ids) -> dict:
+        store = self._store
+        slot_of = store.slot
+        map_names = self._map_names
+        return {pid: store.row(slot_of(pid), map_names) for pid in ids}
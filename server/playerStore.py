@@ -0,0 +1,124 @@
+from array import array
+from typing import Iterable
+
+# Column type codes
+_ID = "q"         # int64 player id, -1 for a free slot
+_COORD = "d"      # float64 x / y in pixels
+_MAP = "H"        # uint16 index into the handler's map table
+_DIR = "B"        # uint8 direction
+_VELOCITY = "d"   # float64 vx / vy in pixels per second, so an unchanged update compares equal
+_TIME = "d"       # float64 time.monotonic() of the last change
+_VERSION = "Q"    # uint64 handler version of the last change
+
+FREE = -1
+
+
+class PlayerStore:
+    '''
+    Players stored column by column in typed arrays, one slot per player.
+
+    A player costs a few dozen bytes of column data plus one id -> slot
+    entry instead of a dataclass instance with its own __dict__ and boxed
+    floats. Slots of removed players go on a free list and are reused, so
+    memory only grows with the peak number of players online.
+    Not thread safe; PlayerHandler calls it with its lock held.
+    '''
+    ids: array
+    xs: array
+    ys: array
+    maps: array
+    dirs: array
+    vxs: array
+    vys: array
+    last_update: array
+    # Written by PlayerHandler, tells its change logs which entries are current
+    changed_at: array
+
+    _slot_of: dict[int, int]
+    _free: list[int]
+
+    def __init__(self):
+        self.ids = array(_ID)
+        self.xs = array(_COORD)
+        self.ys = array(_COORD)
+        self.maps = array(_MAP)
+        self.dirs = array(_DIR)
+        self.vxs = array(_VELOCITY)
+        self.vys = array(_VELOCITY)
+        self.last_update = array(_TIME)
+        self.changed_at = array(_VERSION)
+
+        self._slot_of = {}
+        self._free = []
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    def __contains__(self, pid: int) -> bool:
+        return pid in self._slot_of
+
+    def pids(self) -> Iterable[int]:
+        return self._slot_of.keys()
+
+    def slot(self, pid: int) -> int | None:
+        return self._slot_of.get(pid)
+
+    def add(self, pid: int, map_id: int, now: float) -> int:
+        if self._free:
+            slot = self._free.pop()
+            self.ids[slot] = pid
+            self.xs[slot] = 0.0
+            self.ys[slot] = 0.0
+            self.maps[slot] = map_id
+            self.dirs[slot] = 0
+            self.vxs[slot] = 0.0
+            self.vys[slot] = 0.0
+            self.last_update[slot] = now
+            self.changed_at[slot] = 0
+        else:
+            slot = len(self.ids)
+            self.ids.append(pid)
+            self.xs.append(0.0)
+            self.ys.append(0.0)
+            self.maps.append(map_id)
+            self.dirs.append(0)
+            self.vxs.append(0.0)
+            self.vys.append(0.0)
+            self.last_update.append(now)
+            self.changed_at.append(0)
+        self._slot_of[pid] = slot
+        return slot
+
+    def remove(self, pid: int) -> int | None:
+        slot = self._slot_of.pop(pid, None)
+        if slot is not None:
+            self.ids[slot] = FREE
+            self._free.append(slot)
+        return slot
+
+    def update(self, slot: int, x: float, y: float, map_id: int, direction: int,
+               vx: float, vy: float, now: float) -> bool:
+        '''Writes the row and returns whether anything changed.'''
+        if (self.xs[slot] == x and self.ys[slot] == y
+                and self.maps[slot] == map_id and self.dirs[slot] == direction
+                and self.vxs[slot] == vx and self.vys[slot] == vy):
+            return False
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.maps[slot] = map_id
+        self.dirs[slot] = direction
+        self.vxs[slot] = vx
+        self.vys[slot] = vy
+        self.last_update[slot] = now
+        return True
+
+    def row(self, slot: int, map_names: list[str]) -> dict:
+        return {
+            "id": self.ids[slot],
+            "x": self.xs[slot],
+            "y": self.ys[slot],
+            "map": map_names[self.maps[slot]],
+            "dir": self.dirs[slot],
+            "vx": self.vxs[slot],
+            "vy": self.vys[slot]
+        }
@@ -0,0 +1,171 @@
+'''
+Compact binary wire format for /players, negotiated by content type.
+
+    update body     : RECORD * n
+    snapshot / delta: SNAPSHOT_HEADER, map table, RECORD * n_records, REMOVED * n_removed
+    map table entry : u8 length + utf-8 name, indexed in order
+
+A record is the player id, x / y quantized to whole pixels, the index of the
+player's map in the server's map table, the direction and the velocity in
+whole pixels per second, so peers can extrapolate between updates. Clients learn the
+map table from binary snapshots or GET /maps; an update for a map the server
+has not seen yet has to go through JSON once so it gets added to the table.
+
+    UDP datagram    : DATAGRAM_HEADER, RECORD * n
+
+Datagrams carry the sender's sequence number; the server drops any datagram
+that is not newer than the last one it applied for that player.
+'''
+import struct
+
+CONTENT_TYPE = "application/x-monster-go"
+PROTOCOL_VERSION = 2
+
+# id, x, y, map index, direction, vx, vy
+RECORD = struct.Struct("<IHHBBhh")
+# protocol version, flags, world version, scope map index, map count, record count, removed count
+SNAPSHOT_HEADER = struct.Struct("<BBQBHII")
+REMOVED = struct.Struct("<I")
+# protocol version, sequence number
+DATAGRAM_HEADER = struct.Struct("<BI")
+# Stay below the usual path MTU so datagrams are never fragmented
+MAX_DATAGRAM = 1200
+SEQ_MASK = 0xFFFFFFFF
+
+FLAG_FULL = 0x01
+NO_MAP = 0xFF
+MAX_MAPS = NO_MAP
+# Player ids travel as u32
+MAX_ID = 0xFFFFFFFF
+MAX_COORD = 0xFFFF
+MAX_VELOCITY = 0x7FFF
+
+
+def quantize(value: float) -> int:
+    if value <= 0:
+        return 0
+    v = int(value + 0.5)
+    return v if v <= MAX_COORD else MAX_COORD
+
+
+def quantize_velocity(value: float) -> int:
+    v = int(round(value))
+    return max(-MAX_VELOCITY, min(MAX_VELOCITY, v))
+
+
+def encode_updates(updates: list[tuple[int, float, float, int, int, float, float]]) -> bytes:
+    buf = bytearray(RECORD.size * len(updates))
+    offset = 0
+    for pid, x, y, map_index, direction, vx, vy in updates:
+        RECORD.pack_into(buf, offset, pid, quantize(x), quantize(y), map_index, direction,
+                         quantize_velocity(vx), quantize_velocity(vy))
+        offset += RECORD.size
+    return bytes(buf)
+
+
+def decode_updates(body: bytes) -> list[tuple[int, int, int, int, int, int, int]]:
+    if len(body) % RECORD.size:
+        raise ValueError("truncated update record")
+    return list(RECORD.iter_unpack(body))
+
+
+def encode_datagram(seq: int, updates: list[tuple[int, float, float, int, int, float, float]]) -> bytes:
+    return DATAGRAM_HEADER.pack(PROTOCOL_VERSION, seq & SEQ_MASK) + encode_updates(updates)
+
+
+def decode_datagram(data: bytes) -> tuple[int, list[tuple[int, int, int, int, int, int, int]]]:
+    if len(data) < DATAGRAM_HEADER.size:
+        raise ValueError("truncated datagram")
+    proto, seq = DATAGRAM_HEADER.unpack_from(data, 0)
+    if proto != PROTOCOL_VERSION:
+        raise ValueError(f"unsupported protocol version {proto}")
+    return seq, decode_updates(data[DATAGRAM_HEADER.size:])
+
+
+def seq_newer(seq: int, last: int) -> bool:
+    '''Serial number comparison, so the 32-bit sequence may wrap around.'''
+    return 0 < ((seq - last) & SEQ_MASK) < 0x80000000
+
+
+def encode_snapshot(data: dict, map_names: list[str]) -> bytes:
+    '''
+    Encodes a snapshot or delta payload as produced by PlayerHandler.
+    Raises ValueError when the map table does not fit the format.
+    '''
+    if len(map_names) > MAX_MAPS:
+        raise ValueError("too many maps for the binary format")
+    map_ids = {name: i for i, name in enumerate(map_names)}
+    players = data["players"]
+    removed = data.get("removed", [])
+    scope = data.get("map")
+
+    table = bytearray()
+    for name in map_names:
+        raw = name.encode("utf-8")
+        if len(raw) > 0xFF:
+            raise ValueError(f"map name too long: {name!r}")
+        table.append(len(raw))
+        table += raw
+
+    header = SNAPSHOT_HEADER.pack(
+        PROTOCOL_VERSION,
+        FLAG_FULL if data.get("full", True) else 0,
+        data["version"],
+        map_ids.get(scope, NO_MAP) if scope is not None else NO_MAP,
+        len(map_names),
+        len(players),
+        len(removed),
+    )
+
+    # One pack call for all records is much cheaper than one call per record
+    values: list[int] = []
+    extend = values.extend
+    for p in players.values():
+        extend((p["id"], quantize(p["x"]), quantize(p["y"]), map_ids[p["map"]], p.get("dir", 0),
+                quantize_velocity(p.get("vx", 0.0)), quantize_velocity(p.get("vy", 0.0))))
+    records = struct.pack("<" + RECORD.format[1:] * len(players), *values)
+
+    tail = bytearray(REMOVED.size * len(removed))
+    for i, pid in enumerate(removed):
+        REMOVED.pack_into(tail, i * REMOVED.size, pid)
+
+    return b"".join((header, table, records, tail))
+
+
+def decode_snapshot(body: bytes) -> tuple[dict, list[str]]:
+    '''
+    Returns the payload in the same shape as the JSON response, plus the
+    server's map table so the caller can encode its own updates.
+    '''
+    (proto, flags, version, scope, n_maps,
+     n_records, n_removed) = SNAPSHOT_HEADER.unpack_from(body, 0)
+    if proto != PROTOCOL_VERSION:
+        raise ValueError(f"unsupported protocol version {proto}")
+    offset = SNAPSHOT_HEADER.size
+
+    map_names: list[str] = []
+    for _ in range(n_maps):
+        length = body[offset]
+        map_names.append(body[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+
+    end = offset + RECORD.size * n_records
+    players = {
+        pid: {"id": pid, "x": float(x), "y": float(y), "map": map_names[map_index], "dir": direction,
+              "vx": float(vx), "vy": float(vy)}
+        for pid, x, y, map_index, direction, vx, vy in RECORD.iter_unpack(body[offset:end])
+    }
+    offset = end
+
+    end = offset + REMOVED.size * n_removed
+    removed = [pid for (pid,) in REMOVED.iter_unpack(body[offset:end])]
+
+    data = {
+        "version": version,
+        "full": bool(flags & FLAG_FULL),
+        "players": players,
+        "removed": removed,
+    }
+    if scope != NO_MAP:
+        data["map"] = map_names[scope]
+    return data, map_names
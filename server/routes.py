@@ -0,0 +1,285 @@
+import json
+import math
+import time
+from urllib.parse import urlsplit, parse_qs
+from dataclasses import dataclass, field
+from typing import Mapping
+
+from server.playerHandler import MapTableError, PlayerHandler, Update
+from server.spatialHash import WORLD_LIMIT
+from server import protocol
+
+# Known paths get their own metrics, everything else is counted as "other"
+ROUTES = frozenset(("/", "/register", "/maps", "/metrics", "/players", "/players/batch", "/players/leave", "/players/near", "/players/stream"))
+
+
+@dataclass
+class Response:
+    code: int
+    body: bytes
+    content_type: str = "application/json"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+def json_response(code: int, obj: object) -> Response:
+    return Response(code, json.dumps(obj).encode("utf-8"))
+
+
+def split_path(path: str) -> tuple[str, dict[str, str]]:
+    url = urlsplit(path)
+    return url.path, {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+
+def _in_world(coord: float) -> bool:
+    # Also False for nan
+    return -WORLD_LIMIT <= coord <= WORLD_LIMIT
+
+
+class Router:
+    '''
+    Transport independent request handling, shared by the legacy HTTPServer
+    handler and the asyncio server so both speak exactly the same contract.
+    Header names are expected in lower case.
+    '''
+    player_handler: PlayerHandler
+    # Port of the UdpChannel, announced to clients on /register
+    udp_port: int | None
+
+    def __init__(self, player_handler: PlayerHandler, udp_port: int | None = None):
+        self.player_handler = player_handler
+        self.udp_port = udp_port
+
+    def handle_get(self, path: str, headers: Mapping[str, str]) -> Response:
+        start = time.perf_counter()
+        path, query = split_path(path)
+        response = self._get(path, query, headers)
+        self._observe("GET", path, response, start, 0)
+        return response
+
+    def handle_post(self, path: str, headers: Mapping[str, str], body: bytes) -> Response:
+        start = time.perf_counter()
+        path = split_path(path)[0]
+        response = self._post(path, headers, body)
+        self._observe("POST", path, response, start, len(body))
+        return response
+
+    def _observe(self, method: str, path: str, response: Response, start: float, request_bytes: int) -> None:
+        route = f"{method} {path}" if path in ROUTES else f"{method} other"
+        self.player_handler.metrics.observe_request(
+            route, response.code, time.perf_counter() - start, request_bytes, len(response.body)
+        )
+
+    def _get(self, path: str, query: dict[str, str], headers: Mapping[str, str]) -> Response:
+        if path == "/":
+            return json_response(200, {"status": "ok"})
+
+        if path == "/register":
+            pid = self.player_handler.register()
+            body = {"message": "registration successful", "id": pid}
+            if self.udp_port is not None:
+                body["udp_port"] = self.udp_port
+            return json_response(200, body)
+
+        if path == "/metrics":
+            handler = self.player_handler
+            if query.get("format") == "text":
+                text = handler.metrics.to_text(handler.player_count())
+                return Response(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+            return json_response(200, handler.metrics.to_dict(handler.player_count()))
+
+        if path == "/maps":
+            return json_response(200, {"maps": self.player_handler.map_names()})
+
+        if path == "/players":
+            try:
+                map_name = self.resolve_map(query)
+            except ValueError:
+                return json_response(400, {"error": "bad_id"})
+            since = None
+            if "since" in query:
+                try:
+                    since = int(query["since"])
+                except ValueError:
+                    return json_response(400, {"error": "bad_since"})
+            return self._players_response(map_name, since, headers)
+
+        if path == "/players/near":
+            return self._near_response(query, headers)
+
+        return json_response(404, {"error": "not_found"})
+
+    def _players_response(self, map_name: str | None, since: int | None, headers: Mapping[str, str]) -> Response:
+        content_type = "application/json"
+        etag, body = None, b""
+        if protocol.CONTENT_TYPE in headers.get("accept", ""):
+            try:
+                etag, body = self.player_handler.encoded_players(map_name, since, "binary")
+                content_type = protocol.CONTENT_TYPE
+            except ValueError:
+                pass
+        if etag is None:
+            etag, body = self.player_handler.encoded_players(map_name, since, "json")
+
+        extra = {"ETag": etag}
+        if self.player_handler.tick_rate:
+            # Current server tick, also for binary bodies and 304s
+            extra["X-Server-Tick"] = str(self.player_handler.published.tick)
+        if headers.get("if-none-match") == etag:
+            return Response(304, b"", content_type, extra)
+        extra["Vary"] = "Accept"
+        return Response(200, body, content_type, extra)
+
+    def _near_response(self, query: dict[str, str], headers: Mapping[str, str]) -> Response:
+        '''
+        GET /players/near?map=&x=&y=&r= : full snapshot of the players on the
+        map within r pixels of (x, y).
+        '''
+        missing = [k for k in ("map", "x", "y", "r") if k not in query]
+        if missing:
+            return json_response(400, {"error": "bad_fields", "missing": missing})
+        try:
+            x, y, r = float(query["x"]), float(query["y"]), float(query["r"])
+        except ValueError:
+            return json_response(400, {"error": "bad_fields"})
+        if not (_in_world(x) and _in_world(y) and r >= 0):
+            return json_response(400, {"error": "bad_fields"})
+        # Any larger radius already reaches every position in the world
+        r = min(r, 4 * WORLD_LIMIT)
+
+        data = self.player_handler.near(query["map"], x, y, r)
+        if protocol.CONTENT_TYPE in headers.get("accept", ""):
+            try:
+                return Response(200, protocol.encode_snapshot(data, self.player_handler.map_names()),
+                                protocol.CONTENT_TYPE)
+            except ValueError:
+                pass
+        return json_response(200, data)
+
+    def resolve_map(self, query: dict[str, str]) -> str | None:
+        '''
+        Interest filter for /players: an explicit ?map=, otherwise the map the
+        caller (?id=) reported in its last update, otherwise every map.
+        '''
+        if "map" in query:
+            return query["map"]
+        if "id" in query:
+            return self.player_handler.map_of(int(query["id"]))
+        return None
+
+    def _post(self, path: str, headers: Mapping[str, str], body: bytes) -> Response:
+        if path not in ("/players", "/players/batch", "/players/leave"):
+            return json_response(404, {"error": "not_found"})
+
+        if headers.get("content-type", "").startswith(protocol.CONTENT_TYPE):
+            # The binary format only carries position updates
+            if path == "/players/leave":
+                return json_response(415, {"error": "unsupported_media_type"})
+            return self._post_binary(body)
+
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except Exception:
+            return json_response(400, {"error": "invalid_json"})
+
+        if path == "/players/batch":
+            return self._post_batch(data)
+
+        if path == "/players/leave":
+            try:
+                pid = int(data["id"])
+            except (KeyError, ValueError, TypeError, OverflowError):
+                return json_response(400, {"error": "bad_fields", "missing": ["id"]})
+            if not self.player_handler.remove(pid):
+                return json_response(404, {"error": "player_not_found"})
+            return json_response(200, {"success": True})
+
+        update = self._parse_update(data)
+        if isinstance(update, Response):
+            return update
+
+        try:
+            ok = self.player_handler.update(*update)
+        except MapTableError as e:
+            return json_response(400, {"error": "bad_map", "reason": str(e)})
+        if not ok:
+            return json_response(404, {"error": "player_not_found"})
+
+        return json_response(200, {"success": True})
+
+    def _post_batch(self, data: object) -> Response:
+        '''
+        Body: {"updates": [update, ...]} where each update has the same fields
+        as POST /players plus an optional client timestamp "t". Updates are
+        applied oldest first under one PlayerHandler lock acquisition; when
+        any update has no "t" they are applied in list order instead.
+        '''
+        entries = data.get("updates") if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            return json_response(400, {"error": "bad_fields", "missing": ["updates"]})
+
+        timed = []
+        for i, entry in enumerate(entries):
+            update = self._parse_update(entry)
+            if isinstance(update, Response):
+                return update
+            t = None
+            if "t" in entry:
+                try:
+                    t = float(entry["t"])
+                except (ValueError, TypeError, OverflowError):
+                    return json_response(400, {"error": "bad_fields"})
+                if not math.isfinite(t):
+                    return json_response(400, {"error": "bad_fields"})
+            timed.append((t, i, update))
+        # Client timestamps and list indices are not comparable, so sort only when every entry has "t"
+        if all(t is not None for t, _, _ in timed):
+            timed.sort(key=lambda item: (item[0], item[1]))
+
+        try:
+            missing = self.player_handler.update_many(update for _, _, update in timed)
+        except MapTableError as e:
+            return json_response(400, {"error": "bad_map", "reason": str(e)})
+        return json_response(200, {"success": not missing, "received": len(entries), "missing": missing})
+
+    @staticmethod
+    def _parse_update(data: object) -> Update | Response:
+        if not isinstance(data, dict):
+            return json_response(400, {"error": "bad_fields"})
+        missing = [k for k in ("id", "x", "y", "map") if k not in data]
+        if missing:
+            return json_response(400, {"error": "bad_fields", "missing": missing})
+
+        try:
+            pid = int(data["id"])
+            x = float(data["x"])
+            y = float(data["y"])
+            map_name = str(data["map"])
+            direction = int(data.get("dir", 0))
+            # Velocity in pixels per second, optional for older clients
+            vx = float(data.get("vx", 0.0))
+            vy = float(data.get("vy", 0.0))
+        except (ValueError, TypeError, OverflowError):
+            return json_response(400, {"error": "bad_fields"})
+        if not 0 <= pid <= protocol.MAX_ID or not 0 <= direction <= 0xFF:
+            return json_response(400, {"error": "bad_fields"})
+        if not (_in_world(x) and _in_world(y) and math.isfinite(vx) and math.isfinite(vy)):
+            return json_response(400, {"error": "bad_fields"})
+        return pid, x, y, map_name, direction, vx, vy
+
+    def _post_binary(self, body: bytes) -> Response:
+        # Any number of records, so the same body works for /players and /players/batch
+        try:
+            records = protocol.decode_updates(body)
+        except ValueError:
+            return json_response(400, {"error": "invalid_body"})
+
+        map_names = self.player_handler.map_names()
+        updates = []
+        for pid, x, y, map_index, direction, vx, vy in records:
+            if map_index >= len(map_names):
+                return json_response(400, {"error": "unknown_map_index"})
+            updates.append((pid, x, y, map_names[map_index], direction, vx, vy))
+
+        if self.player_handler.update_many(updates):
+            return json_response(404, {"error": "player_not_found"})
+        return Response(204, b"", protocol.CONTENT_TYPE)
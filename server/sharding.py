@@ -0,0 +1,121 @@
+'''
+Map-sharded deployment: one worker process per group of maps behind a thin
+router process.
+
+The router only hands out globally unique player ids (/register) and the
+map -> worker table (/shards). Shard-aware clients then talk to the worker
+of their current map directly, so the router stays off the hot path. When a
+player walks through a door into a map owned by another worker, the client
+posts /players/leave to the old worker and simply starts updating the new
+one, which adopts the id on first sight.
+Old clients that only know the router URL are redirected (307) per request.
+'''
+import itertools
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Mapping
+
+from server.routes import Response, json_response, split_path
+
+# Workers run the same entry point, wherever the router was started from
+SERVER_SCRIPT = Path(__file__).resolve().parents[1] / "server.py"
+
+
+class ShardRouter:
+    player_handler = None   # the router keeps no player state
+
+    shards: list[dict]
+    _map_to_url: dict[str, str]
+    _default_url: str
+    _ids: "itertools.count[int]"
+    _id_lock: threading.Lock
+
+    def __init__(self, shards: list[dict]):
+        self.shards = shards
+        self._map_to_url = {m: shard["url"] for shard in shards for m in shard["maps"]}
+        self._default_url = shards[0]["url"]
+        self._ids = itertools.count()
+        self._id_lock = threading.Lock()
+
+    def url_for(self, map_name: str | None) -> str:
+        return self._map_to_url.get(map_name or "", self._default_url)
+
+    def handle_get(self, path: str, headers: Mapping[str, str]) -> Response:
+        route, query = split_path(path)
+
+        if route == "/":
+            return json_response(200, {"status": "ok", "sharded": True})
+
+        if route == "/register":
+            with self._id_lock:
+                pid = next(self._ids)
+            return json_response(200, {"message": "registration successful", "id": pid})
+
+        if route == "/shards":
+            return json_response(200, {"shards": self.shards, "default": self._default_url})
+
+        if route.startswith("/players"):
+            return self._redirect(self.url_for(query.get("map")), path)
+
+        return json_response(404, {"error": "not_found"})
+
+    def handle_post(self, path: str, headers: Mapping[str, str], body: bytes) -> Response:
+        route = split_path(path)[0]
+        if route not in ("/players", "/players/batch"):
+            return json_response(404, {"error": "not_found"})
+        try:
+            data = json.loads(body.decode("utf-8"))
+            if route == "/players/batch":
+                data = data["updates"][-1]
+            map_name = str(data["map"])
+        except Exception:
+            return json_response(400, {"error": "sharded_server_needs_json_with_map"})
+        return self._redirect(self.url_for(map_name), path)
+
+    @staticmethod
+    def _redirect(url: str, path: str) -> Response:
+        return Response(307, b"", "application/json", {"Location": url + path})
+
+
+def spawn_shards(groups: list[list[str]], host: str, public_host: str, base_port: int,
+                 extra_args: tuple[str, ...] = ()) -> tuple[list[dict], list[subprocess.Popen]]:
+    '''
+    Starts one asyncio worker per map group on base_port + 1, + 2, ...
+    Returns the shard table for ShardRouter and the worker processes.
+    '''
+    shards = []
+    procs = []
+    try:
+        for i, maps in enumerate(groups):
+            port = base_port + 1 + i
+            procs.append(subprocess.Popen([
+                sys.executable, str(SERVER_SCRIPT), "--mode", "async", "--shard-worker",
+                "--host", host, "--port", str(port), *extra_args
+            ]))
+            shards.append({"maps": maps, "url": f"http://{public_host}:{port}", "pid": procs[-1].pid})
+        for i in range(len(groups)):
+            _wait_for_port(base_port + 1 + i)
+    except BaseException:
+        # The caller never gets the processes, so nobody else would stop them
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+        raise
+    return shards, procs
+
+
+def _wait_for_port(port: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"shard worker on port {port} did not start")
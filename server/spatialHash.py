@@ -0,0 +1,90 @@
+import math
+from typing import Iterator
+
+# Must match GameSettings.TILE_SIZE of the client, positions arrive in pixels
+TILE_SIZE = 64
+# Cell edge in tiles. About a quarter of the client's 20 x 11 tile screen,
+# so a screen-sized query touches a few dozen cells.
+CELL_TILES = 4
+# Positions and query radii are accepted up to this many pixels from the
+# origin, so the bounds of a query never overflow to inf
+WORLD_LIMIT = float(2 ** 31)
+
+Cell = tuple[int, int, int]     # map index, cell x, cell y
+
+
+class SpatialHash:
+    '''
+    Uniform grid over every map: cell (map, x // cell, y // cell) -> ids of
+    the players in it, with cells measured in tiles.
+
+    PlayerHandler calls move() after each applied update; a player who stays
+    inside their cell, the common case, costs two divisions and a compare.
+    query() only visits the cells overlapping the circle, so its cost is the
+    number of those cells plus the players in them, not everyone on the map.
+    Not thread safe; PlayerHandler calls it with its lock held.
+    '''
+    cell_size: float     # pixels
+
+    _cells: dict[Cell, set[int]]
+    _cell_of: dict[int, Cell]
+
+    def __init__(self, cell_tiles: int = CELL_TILES, tile_size: int = TILE_SIZE):
+        self.cell_size = float(cell_tiles * tile_size)
+        self._cells = {}
+        self._cell_of = {}
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def cell(self, map_id: int, x: float, y: float) -> Cell:
+        size = self.cell_size
+        return map_id, math.floor(x / size), math.floor(y / size)
+
+    def move(self, pid: int, map_id: int, x: float, y: float) -> None:
+        self.place(pid, self.cell(map_id, x, y))
+
+    def place(self, pid: int, cell: Cell) -> None:
+        '''move() with the cell already computed.'''
+        old = self._cell_of.get(pid)
+        if old == cell:
+            return
+        if old is not None:
+            self._discard(pid, old)
+        self._cell_of[pid] = cell
+        members = self._cells.get(cell)
+        if members is None:
+            self._cells[cell] = {pid}
+        else:
+            members.add(pid)
+
+    def remove(self, pid: int) -> None:
+        old = self._cell_of.pop(pid, None)
+        if old is not None:
+            self._discard(pid, old)
+
+    def cells_in_range(self, map_id: int, x: float, y: float, r: float) -> int:
+        '''How many cells query() would visit.'''
+        _, x0, y0 = self.cell(map_id, x - r, y - r)
+        _, x1, y1 = self.cell(map_id, x + r, y + r)
+        return (x1 - x0 + 1) * (y1 - y0 + 1)
+
+    def query(self, map_id: int, x: float, y: float, r: float) -> Iterator[int]:
+        '''
+        Ids in the cells overlapping the square around (x, y) with half-size
+        r. The caller checks the exact distance.
+        '''
+        _, x0, y0 = self.cell(map_id, x - r, y - r)
+        _, x1, y1 = self.cell(map_id, x + r, y + r)
+        cells = self._cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                members = cells.get((map_id, cx, cy))
+                if members:
+                    yield from members
+
+    def _discard(self, pid: int, cell: Cell) -> None:
+        members = self._cells[cell]
+        members.discard(pid)
+        if not members:
+            del self._cells[cell]
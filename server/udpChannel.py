@@ -0,0 +1,112 @@
+import random
+import socket
+import threading
+import time
+
+from server import protocol
+from server.playerHandler import PlayerHandler
+
+# Forget the sequence numbers of players that are gone once the table is this much larger
+SEQ_TABLE_SLACK = 1024
+
+
+class UdpChannel:
+    '''
+    Position updates over UDP, next to the HTTP server.
+
+    A datagram carries the sender's sequence number and binary update
+    records (see protocol.py). Positions are latest-wins, so a lost datagram
+    is simply superseded by the next one instead of stalling everything
+    behind it like a lost TCP segment does; datagrams that arrive after a
+    newer one from the same player are dropped. Registration, the map table
+    and snapshots stay on HTTP. Unknown players are ignored.
+
+    `loss` drops that fraction of incoming datagrams on purpose, to try the
+    client on loopback as if it were on a lossy network.
+    '''
+    player_handler: PlayerHandler
+    host: str
+    port: int
+    loss: float
+
+    _sock: socket.socket | None
+    _thread: threading.Thread | None
+    # pid -> sequence number of the last datagram applied
+    _last_seq: dict[int, int]
+    _random: random.Random
+
+    def __init__(self, player_handler: PlayerHandler, host: str = "0.0.0.0", port: int = 8990, loss: float = 0.0):
+        self.player_handler = player_handler
+        self.host = host
+        self.port = port
+        self.loss = loss
+
+        self._sock = None
+        self._thread = None
+        self._last_seq = {}
+        self._random = random.Random()
+
+    def start(self) -> None:
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self._sock.bind((self.host, self.port))
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, name="UdpChannel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            # Wake the blocking recvfrom so the thread can exit
+            sock.sendto(b"", ("127.0.0.1", self.port))
+            sock.close()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+
+    def _serve(self) -> None:
+        while True:
+            sock = self._sock
+            if sock is None:
+                return
+            try:
+                data, _ = sock.recvfrom(protocol.MAX_DATAGRAM)
+            except OSError:
+                return
+            if not data or (self.loss and self._random.random() < self.loss):
+                continue
+            self.handle(data)
+
+    def handle(self, data: bytes) -> int:
+        '''Applies one datagram and returns the number of updates applied.'''
+        start = time.perf_counter()
+        metrics = self.player_handler.metrics
+        try:
+            seq, records = protocol.decode_datagram(data)
+        except ValueError:
+            metrics.observe_request("UDP /players", 400, time.perf_counter() - start, len(data), 0)
+            return 0
+
+        map_names = self.player_handler.map_names()
+        last_seq = self._last_seq
+        updates = []
+        for pid, x, y, map_index, direction, vx, vy in records:
+            last = last_seq.get(pid)
+            if map_index >= len(map_names) or (last is not None and not protocol.seq_newer(seq, last)):
+                continue
+            last_seq[pid] = seq
+            updates.append((pid, x, y, map_names[map_index], direction, vx, vy))
+
+        missing = self.player_handler.update_many(updates) if updates else []
+        for pid in missing:
+            last_seq.pop(pid, None)
+        if len(last_seq) > self.player_handler.player_count() + SEQ_TABLE_SLACK:
+            self._prune()
+
+        # 409: everything in the datagram was stale or unknown
+        status = 204 if len(updates) > len(missing) else 409
+        metrics.observe_request("UDP /players", status, time.perf_counter() - start, len(data), 0)
+        return len(updates) - len(missing)
+
+    def _prune(self) -> None:
+        handler = self.player_handler
+        self._last_seq = {pid: seq for pid, seq in self._last_seq.items() if handler.map_of(pid) is not None}
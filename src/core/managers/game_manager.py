@@ -1,7 +1,9 @@
 from __future__ import annotations
 from src.utils import Logger, GameSettings, Position, Teleport
+from .map_preloader import MapPreloader
 import json, os
 import pygame as pg
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 import shutil
 
@@ -26,7 +28,13 @@ class GameManager:
     
     # Map properties
     current_map_key: str
-    maps: dict[str, Map]
+    # Save entry of every map in the world, in save order. Maps are built
+    # from it on first access; an unloaded map's state is written back here
+    map_entries: dict[str, dict]
+    # Loaded maps, least recently used first
+    maps: "OrderedDict[str, Map]"
+    # Builds the maps behind the current map's teleporters in the background
+    map_preloader: MapPreloader | None
     
     # Changing Scene properties
     should_change_scene: bool
@@ -38,11 +46,15 @@ class GameManager:
                  player: Player | None,
                  enemy_trainers: dict[str, list[EnemyTrainer]], 
                  merchants: dict[str, list[Merchant]],
-                 bag: Bag | None = None):
+                 bag: Bag | None = None,
+                 map_entries: dict[str, dict] | None = None):
                      
         from src.data.bag import Bag
         # Game Properties
-        self.maps = maps
+        self.maps = OrderedDict(maps)
+        self.map_entries = map_entries if map_entries is not None else {}
+        for key, m in maps.items():
+            self.map_entries.setdefault(key, m.to_dict())
         self.current_map_key = start_map
         self.player = player
         self.enemy_trainers = enemy_trainers
@@ -58,22 +70,129 @@ class GameManager:
         self.next_map = ""
         self.player_last_positions = {}
         self.player_spawns = {}
+        self.map_preloader = MapPreloader() if GameSettings.MAP_PRELOAD else None
         
     @property
     def current_map(self) -> Map:
-        return self.maps[self.current_map_key]
+        return self.get_map(self.current_map_key)
         
     @property
     def current_enemy_trainers(self) -> list[EnemyTrainer]:
+        self.get_map(self.current_map_key)
         return self.enemy_trainers[self.current_map_key]
+
+    @property
+    def current_merchants(self) -> list[Merchant]:
+        self.get_map(self.current_map_key)
+        return self.merchants[self.current_map_key]
         
     @property
     def current_teleporter(self) -> list[Teleport]:
-        return self.maps[self.current_map_key].teleporters
+        return self.current_map.teleporters
+
+    def get_map(self, key: str) -> Map:
+        '''
+        Returns the map, building it with its trainers and merchants from the
+        save entry if it is not loaded, and unloads the maps used least
+        recently beyond MAX_LOADED_MAPS.
+        '''
+        m = self.maps.get(key)
+        if m is not None:
+            self.maps.move_to_end(key)
+            return m
+        m = self._load_map(key)
+        self.maps[key] = m
+        self._evict()
+        if key == self.current_map_key:
+            self._preload_neighbors()
+        return m
+
+    def _load_map(self, key: str) -> Map:
+        from src.maps.map import Map
+        from src.entities.enemy_trainer import EnemyTrainer
+        from src.entities.merchant import Merchant
+
+        entry = self.map_entries[key]
+        m = self.map_preloader.take(key) if self.map_preloader is not None else None
+        if m is None:
+            Logger.info(f"Loading map {key}")
+            m = Map.from_dict(entry)
+        # Entities load their sprites through the resource manager, keep them on this thread
+        self.enemy_trainers[key] = [EnemyTrainer.from_dict(t, self) for t in entry.get("enemy_trainers", [])]
+        self.merchants[key] = [Merchant.from_dict(t, self) for t in entry.get("merchants", [])]
+        return m
+
+    def _evict(self) -> None:
+        # 目前的地圖和正要切換過去的地圖不能卸載
+        keep = {self.current_map_key, self.next_map}
+        # 隔一扇門的地圖最後才卸載，不然馬上又會被預先載入
+        neighbors = self._neighbors()
+        for key in sorted(self.maps, key=lambda k: k in neighbors):
+            if len(self.maps) <= GameSettings.MAX_LOADED_MAPS:
+                break
+            if key in keep:
+                continue
+            self.unload_map(key)
+
+    def _neighbors(self) -> set[str]:
+        '''Maps the current map's teleporters lead to.'''
+        m = self.maps.get(self.current_map_key)
+        if m is None:
+            return set()
+        return {tp.destination for tp in m.teleporters if tp.destination in self.map_entries}
+
+    def _preload_neighbors(self) -> None:
+        if self.map_preloader is None:
+            return
+        neighbors = self._neighbors()
+        # Maps no longer one door away are not worth keeping around
+        self.map_preloader.retain(neighbors)
+        for key in neighbors - self.maps.keys():
+            self.map_preloader.request(key, self._map_builder(key))
+
+    def _map_builder(self, key: str):
+        '''
+        Builds the map for the preloader, on its thread, with the chunks
+        around where the player will arrive already baked.
+        '''
+        from src.maps.map import Map
+
+        entry = self.map_entries[key]
+        pos = self._arrival_position(key)
+        if pos is None:
+            sp = entry["player"]
+            pos = Position(sp["x"] * GameSettings.TILE_SIZE, sp["y"] * GameSettings.TILE_SIZE)
+        view = pg.Rect(int(pos.x - GameSettings.SCREEN_WIDTH // 2), int(pos.y - GameSettings.SCREEN_HEIGHT // 2),
+                       GameSettings.SCREEN_WIDTH, GameSettings.SCREEN_HEIGHT)
+
+        def build() -> Map:
+            m = Map.from_dict(entry)
+            m.prebake(view)
+            return m
+        return build
+
+    def _arrival_position(self, key: str) -> Position | None:
+        '''Where try_switch_map puts the player, None for the map's spawn.'''
+        if key not in self.player_last_positions:
+            return None
+        pos = self.player_last_positions[key].copy()
+        if key == "map.tmx":
+            pos.y += GameSettings.TILE_SIZE
+        return pos
+
+    def unload_map(self, key: str) -> None:
+        '''Writes the map's state back to its save entry and drops it.'''
+        if key not in self.maps:
+            return
+        self.map_entries[key] = self._map_block(key)
+        del self.maps[key]
+        self.enemy_trainers.pop(key, None)
+        self.merchants.pop(key, None)
+        Logger.info(f"Unloaded map {key}")
     
     def switch_map(self, target: str) -> None:
-        if target not in self.maps:
-            Logger.warning(f"Map '{target}' not loaded; cannot switch.")
+        if target not in self.map_entries:
+            Logger.warning(f"Map '{target}' not found; cannot switch.")
             return
         if self.player:
             current_map = self.current_map_key
@@ -93,10 +212,13 @@ class GameManager:
                     if self.current_map_key == "map.tmx": 
                         self.player.position.y += GameSettings.TILE_SIZE
                 else:
-                    self.player.position = self.maps[self.current_map_key].spawn
+                    self.player.position = self.current_map.spawn
+            # 換了地圖，改成預先載入新地圖門後的地圖
+            self.get_map(self.current_map_key)
+            self._preload_neighbors()
             
     def check_collision(self, rect: pg.Rect) -> bool:
-        if self.maps[self.current_map_key].check_collision(rect):
+        if self.current_map.check_collision(rect):
             return True
         for entity in self.enemy_trainers[self.current_map_key]:
             if rect.colliderect(entity.animation.rect):
@@ -180,21 +302,8 @@ class GameManager:
         if self.player: # 將當前位置存入 player_spawns 字典
             self.player_spawns[self.current_map_key] = self.player.position
 
-        for key, m in self.maps.items():
-            block = m.to_dict()
-            block["enemy_trainers"] = [t.to_dict() for t in self.enemy_trainers.get(key, [])]
-            block["merchants"] = [t.to_dict() for t in self.merchants.get(key, [])]
-            # 取得該地圖對應的座標
-            saved_pos = self.player_spawns.get(key)
-            if saved_pos is None:
-                saved_pos = m.spawn
-
-            ## 將像素座標轉回網格座標存入 JSON
-            block["player"] = {
-                "x": int(saved_pos.x / GameSettings.TILE_SIZE),
-                "y": int(saved_pos.y / GameSettings.TILE_SIZE)
-            }
-            map_blocks.append(block)
+        for key in self.map_entries:
+            map_blocks.append(self._map_block(key))
 
         return {
             "map": map_blocks,
@@ -203,24 +312,48 @@ class GameManager:
             "bag": self.bag.to_dict(),
         }
 
+    def _map_block(self, key: str) -> dict[str, object]:
+        '''
+        The save entry of one map. A map that is not loaded (and the player is
+        not on) has not changed since its entry was read or written back, so
+        the entry is returned as is.
+        '''
+        entry = self.map_entries[key]
+        m = self.maps.get(key)
+        if m is None and key != self.current_map_key:
+            return entry
+
+        # Keys the game does not know about (e.g. roaming_mobs) are kept
+        block = dict(entry)
+        if m is not None:
+            block.update(m.to_dict())
+            block["enemy_trainers"] = [t.to_dict() for t in self.enemy_trainers.get(key, [])]
+            block["merchants"] = [t.to_dict() for t in self.merchants.get(key, [])]
+        # 取得該地圖對應的座標
+        saved_pos = self.player_spawns.get(key)
+        if saved_pos is None and m is not None:
+            saved_pos = m.spawn
+
+        ## 將像素座標轉回網格座標存入 JSON
+        if saved_pos is not None:
+            block["player"] = {
+                "x": int(saved_pos.x / GameSettings.TILE_SIZE),
+                "y": int(saved_pos.y / GameSettings.TILE_SIZE)
+            }
+        return block
+
     @classmethod
     def from_dict(cls, data: dict[str, object]) -> "GameManager":
-        from src.maps.map import Map
         from src.entities.player import Player
-        from src.entities.enemy_trainer import EnemyTrainer
-        from src.entities.merchant import Merchant
         from src.data.bag import Bag
         
-        Logger.info("Loading maps")
-        maps_data = data["map"]
-        maps: dict[str, Map] = {}
+        # Maps, with their trainers and merchants, are built on first access
+        map_entries: dict[str, dict] = {}
         player_spawns: dict[str, Position] = {}
-        trainers: dict[str, list[EnemyTrainer]] = {}
-        merchants: dict[str, list[Merchant]] = {}
 
-        for entry in maps_data:
+        for entry in data["map"]:
             path = entry["path"]
-            maps[path] = Map.from_dict(entry)
+            map_entries[path] = entry
             sp = entry.get("player")
             if sp:
                 player_spawns[path] = Position(
@@ -229,25 +362,16 @@ class GameManager:
                 )
         current_map = data["current_map"]
         gm = cls(
-            maps, current_map,
+            {}, current_map,
             None, # Player
-            trainers,
-            merchants,
-            bag=None
+            {},
+            {},
+            bag=None,
+            map_entries=map_entries
         )
         gm.player_spawns = player_spawns
         gm.current_map_key = current_map
         
-        Logger.info("Loading enemy trainers")
-        for m in data["map"]:
-            raw_data = m["enemy_trainers"]
-            gm.enemy_trainers[m["path"]] = [EnemyTrainer.from_dict(t, gm) for t in raw_data]
-        
-        Logger.info("Loading merchants")
-        for m in data["map"]:
-            raw_data = m["merchants"]
-            gm.merchants[m["path"]] = [Merchant.from_dict(t, gm) for t in raw_data]
-        
         Logger.info("Loading Player")
         if data.get("player"):
             gm.player = Player.from_dict(data["player"], gm)
@@ -0,0 +1,171 @@
+import asyncio
+import json
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+
+from .net_stats import NetStats
+
+CONNECT_TIMEOUT = 3.0
+READ_TIMEOUT = 5.0
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpResponse:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> object:
+        return json.loads(self.body.decode("utf-8"))
+
+
+class HttpConnection:
+    '''
+    One HTTP/1.1 keep-alive connection for the OnlineManager I/O loop.
+
+    Requests on the same connection are serialized with an asyncio.Lock, so
+    the send and fetch coroutines can share it. A request that fails on a
+    connection reused from an earlier request (the server may have closed it
+    while idle) is retried once on a fresh connection; position updates are
+    latest-wins, so sending one twice is harmless.
+
+    Bytes on the wire and (re)connects are counted in `stats`.
+    '''
+    host: str
+    port: int
+    stats: NetStats
+
+    _reader: asyncio.StreamReader | None
+    _writer: asyncio.StreamWriter | None
+    _lock: asyncio.Lock
+
+    def __init__(self, base_url: str, stats: NetStats):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 80
+        self.stats = stats
+        self._reader = None
+        self._writer = None
+        self._lock = asyncio.Lock()
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: dict[str, str] | None = None) -> HttpResponse:
+        async with self._lock:
+            for attempt in range(2):
+                reused = self._writer is not None
+                try:
+                    if not reused:
+                        await self._connect()
+                    return await asyncio.wait_for(self._exchange(method, path, body, headers), READ_TIMEOUT)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, HttpError):
+                    self.close()
+                    if not reused or attempt:
+                        raise
+            raise HttpError("unreachable")
+
+    async def stream(self, path: str, headers: dict[str, str] | None, read_timeout: float) -> AsyncIterator[str]:
+        '''
+        Sends a GET and yields the body line by line as it arrives (for
+        server-sent events). Raises HttpError with the status code when the
+        server answers with anything but 200. The connection is closed when
+        the generator ends.
+        '''
+        try:
+            await self._connect()
+            self._send_head("GET", path, b"", headers)
+            status, response_headers = await asyncio.wait_for(self._read_head(), READ_TIMEOUT)
+            if status != 200:
+                raise HttpError(status)
+            chunked = response_headers.get("transfer-encoding", "").lower() == "chunked"
+            pending = b""
+            while True:
+                if chunked:
+                    data = await asyncio.wait_for(self._read_chunk(), read_timeout)
+                    if not data:
+                        return
+                else:
+                    data = await asyncio.wait_for(self._reader.read(65536), read_timeout)
+                    if not data:
+                        return
+                    self.stats.bytes_received += len(data)
+                pending += data
+                *lines, pending = pending.split(b"\n")
+                for line in lines:
+                    yield line.rstrip(b"\r").decode("utf-8")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=MAX_HEADER_BYTES), CONNECT_TIMEOUT
+        )
+        self.stats.connects += 1
+
+    def _send_head(self, method: str, path: str, body: bytes, headers: dict[str, str] | None) -> None:
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        data = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        self._writer.write(data)
+        self.stats.bytes_sent += len(data)
+
+    async def _exchange(self, method: str, path: str, body: bytes, headers: dict[str, str] | None) -> HttpResponse:
+        self._send_head(method, path, body, headers)
+        await self._writer.drain()
+        status, response_headers = await self._read_head()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            while chunk := await self._read_chunk():
+                parts.append(chunk)
+            payload = b"".join(parts)
+        elif "content-length" in response_headers:
+            length = int(response_headers["content-length"])
+            payload = await self._reader.readexactly(length) if length else b""
+            self.stats.bytes_received += length
+        elif status in (204, 304):
+            payload = b""
+        else:
+            payload = await self._reader.read()
+            self.stats.bytes_received += len(payload)
+            response_headers["connection"] = "close"
+
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return HttpResponse(status, response_headers, payload)
+
+    async def _read_head(self) -> tuple[int, dict[str, str]]:
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        self.stats.bytes_received += len(head)
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            status = int(lines[0].split()[1])
+        except (IndexError, ValueError):
+            raise HttpError(f"bad status line {lines[0]!r}")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _read_chunk(self) -> bytes:
+        size_line = await self._reader.readuntil(b"\r\n")
+        size = int(size_line.split(b";")[0], 16)
+        data = await self._reader.readexactly(size + 2)
+        self.stats.bytes_received += len(size_line) + len(data)
+        return data[:-2]
@@ -0,0 +1,119 @@
+from __future__ import annotations
+import os
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Callable
+
+from src.utils import Logger
+
+if TYPE_CHECKING:
+    from src.maps.map import Map
+
+# Niceness of the worker thread where the OS supports it per thread
+WORKER_NICE = 10
+
+
+class MapPreloader:
+    '''
+    Builds maps on a worker thread before the game needs them.
+
+    The game thread asks for the maps behind the current map's teleporters
+    with request(); the worker builds them (parsing or reading the map cache
+    and baking the chunks around where the player will arrive) and keeps
+    them until take() hands one over, which only swaps a reference. A map
+    that is still being built when it is taken is waited for rather than
+    built twice; one that was not started yet is dropped and the caller
+    builds it itself.
+
+    The worker only runs while there is something to build, so a dropped
+    GameManager does not leave a thread behind.
+    '''
+    # Map loads served by a preloaded map, and the ones that were not
+    hits: int
+    misses: int
+
+    _cond: threading.Condition
+    # (key, build) not started yet, oldest first
+    _queue: deque[tuple[str, Callable[[], Map]]]
+    # Maps the game may still switch to: queued, building or ready
+    _wanted: set[str]
+    _building: str | None
+    _ready: dict[str, Map]
+    _thread: threading.Thread | None
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._wanted = set()
+        self._building = None
+        self._ready = {}
+        self._thread = None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def request(self, key: str, build: Callable[[], Map]) -> None:
+        with self._cond:
+            if key in self._wanted:
+                return
+            self._wanted.add(key)
+            self._queue.append((key, build))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="MapPreloader", daemon=True)
+                self._thread.start()
+
+    def retain(self, keys: set[str]) -> None:
+        '''Forgets every requested map not in keys, built or not.'''
+        with self._cond:
+            self._wanted &= keys
+            self._queue = deque(item for item in self._queue if item[0] in keys)
+            for key in [k for k in self._ready if k not in keys]:
+                del self._ready[key]
+
+    def take(self, key: str) -> Map | None:
+        '''The preloaded map, or None when the caller has to build it.'''
+        with self._cond:
+            if any(item[0] == key for item in self._queue):
+                self._queue = deque(item for item in self._queue if item[0] != key)
+            else:
+                while self._building == key:
+                    self._cond.wait()
+            self._wanted.discard(key)
+            m = self._ready.pop(key, None)
+
+        if m is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        Logger.info(f"Map {key} {'preloaded' if m is not None else 'not preloaded'}, "
+                    f"preload hit rate {self.hits}/{self.hits + self.misses}")
+        return m
+
+    def _run(self) -> None:
+        # 只用遊戲執行緒用剩的 CPU；Linux 上 nice 值是每個執行緒各自的
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WORKER_NICE)
+        except (AttributeError, OSError):
+            pass
+        while True:
+            with self._cond:
+                if not self._queue:
+                    self._thread = None
+                    return
+                key, build = self._queue.popleft()
+                self._building = key
+            m = None
+            try:
+                m = build()
+            except Exception as e:
+                Logger.warning(f"Preloading map {key} failed: {e}")
+            with self._cond:
+                self._building = None
+                # retain() may have dropped it meanwhile
+                if m is not None and key in self._wanted:
+                    self._ready[key] = m
+                self._cond.notify_all()
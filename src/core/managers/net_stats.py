@@ -0,0 +1,96 @@
+import csv
+import os
+from collections import deque
+
+# Round trips kept for the percentiles shown in the overlay
+RTT_WINDOW = 64
+
+CSV_FIELDS = (
+    "time", "rtt_last_ms", "rtt_p50_ms", "rtt_p95_ms", "requests", "request_errors", "connects",
+    "bytes_sent", "bytes_received", "queue_depth", "updates_sent", "updates_skipped",
+    "updates_dropped", "batches_dropped", "snapshot_age_ms", "server_tick", "players", "frame_max_ms",
+)
+
+
+class NetStats:
+    '''
+    Client-side network counters of the OnlineManager, for the F3 overlay
+    and the optional CSV export.
+
+    Every counter has a single writer: the I/O loop records requests,
+    round trips, bytes and snapshots, the game thread records frame times
+    and superseded updates. Readers may see values a frame old, which is
+    fine for diagnostics, so nothing here takes a lock.
+    '''
+    requests: int
+    request_errors: int
+    connects: int
+    bytes_sent: int
+    bytes_received: int
+    rtt_last: float
+    # Outgoing updates replaced by a newer one before the I/O loop sent them
+    updates_dropped: int
+    # Received batches the game thread did not drain in time (inbox full)
+    batches_dropped: int
+    # monotonic time the server last confirmed our copy of the players
+    # (a snapshot, a 304 or a stream heartbeat), 0 before the first one
+    snapshot_at: float
+    # Longest frame since the last CSV row, written by the game thread
+    frame_max: float
+
+    _rtts: deque[float]
+
+    def __init__(self):
+        self.requests = 0
+        self.request_errors = 0
+        self.connects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.rtt_last = 0.0
+        self.updates_dropped = 0
+        self.batches_dropped = 0
+        self.snapshot_at = 0.0
+        self.frame_max = 0.0
+        self._rtts = deque(maxlen=RTT_WINDOW)
+
+    def observe_rtt(self, seconds: float) -> None:
+        self.requests += 1
+        self.rtt_last = seconds
+        self._rtts.append(seconds)
+
+    def observe_frame(self, dt: float) -> None:
+        if dt > self.frame_max:
+            self.frame_max = dt
+
+    def rtt_percentile(self, q: float) -> float:
+        rtts = sorted(self._rtts)
+        if not rtts:
+            return 0.0
+        return rtts[min(len(rtts) - 1, int(q * len(rtts)))]
+
+    def snapshot_age(self, now: float) -> float:
+        return now - self.snapshot_at if self.snapshot_at else 0.0
+
+
+class NetStatsCsv:
+    '''
+    Appends one row of counters per call to a CSV file, writing the header
+    when the file is new. Counters are cumulative; diff consecutive rows
+    for rates.
+    '''
+    path: str
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._new = not os.path.exists(path) or os.path.getsize(path) == 0
+
+    def write(self, row: dict) -> None:
+        with open(self.path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            if self._new:
+                writer.writeheader()
+                self._new = False
+            writer.writerow(row)
@@ -1,142 +1,621 @@
-import requests
+import asyncio
 import threading
-import queue
+import json
+import socket
+import time
+from collections import deque
+from urllib.parse import urlencode, urlsplit
 from src.utils import Logger, GameSettings
+from server import protocol
+from .http_connection import HttpConnection, HttpError, HttpResponse
+from .net_stats import NetStats, NetStatsCsv
+from .remote_player import RemotePlayer
 
-POLL_INTERVAL = 0.05
+# Remote players are drawn INTERPOLATION_DELAY in the past, between two
+# received positions, so polling can be slower without visible stutter
+POLL_INTERVAL = 0.1
+INTERPOLATION_DELAY = 0.1
+STREAM_READ_TIMEOUT = 30.0      # server sends a heartbeat every 15 s
+STREAM_RETRY_INTERVAL = 5.0     # poll this long before trying the stream again
+REGISTER_RETRY_INTERVAL = 5.0
+INBOX_LIMIT = 256               # received batches waiting for the game thread
+UDP_RESEND_INTERVAL = 0.5       # repeat the last datagram this often, so a lost final update heals
+# Dead reckoning: peers extrapolate our last update with its velocity, so we
+# only send when that guess drifts too far, the velocity or map changes, or
+# a moving player has not sent for KEYFRAME_INTERVAL
+DRIFT_THRESHOLD = GameSettings.TILE_SIZE / 4   # pixels
+VELOCITY_EPSILON = 1.0                          # pixels per second
+KEYFRAME_INTERVAL = 1.0     # must stay below remote_player.MAX_EXTRAPOLATION
 
 class OnlineManager:
+    '''
+    All networking runs on one asyncio loop in the "OnlineManagerIO" thread:
+    registration, sending, polling or the player stream, and reconnects.
+    Sends and polls share one keep-alive connection per server; the player
+    stream, being long-lived, has its own.
+
+    Nothing is shared under a lock with the game thread:
+    - update() stores the latest update in _pending (one reference store)
+      and wakes the loop; the loop only ever reads it.
+    - the loop publishes a new list_players per snapshot instead of
+      mutating the published one, so readers never see a half-built list.
+    - received positions go to _inbox (a deque, append/popleft are atomic)
+      and the game thread pushes them into the RemotePlayer histories it
+      owns in sample_remote_players().
+
+    Network diagnostics are collected in `stats`; diagnostics() turns them
+    into one row for the F3 overlay and the CSV export
+    (GameSettings.ONLINE_STATS_CSV).
+    '''
     list_players: list[dict]
     player_id: int
-    
-    _stop_event: threading.Event
-    _fetch_thread: threading.Thread | None
-    _send_thread: threading.Thread | None
-    _lock: threading.Lock
-    _update_queue: queue.Queue
-    
+    updates_sent: int
+    updates_skipped: int
+    # Tick of the last snapshot from a server running a fixed-rate tick, else -1
+    server_tick: int
+    stats: NetStats
+
+    # Local copy of the server table, patched with deltas by the I/O loop
+    _players: dict[int, dict]
+    # Position history of every other player, owned by the game thread
+    _remote: dict[int, RemotePlayer]
+    _remote_list: list[RemotePlayer]
+    # (receive time, players) batches from the I/O loop, drained by the game thread
+    _inbox: deque[tuple[float, dict]]
+    _version: int
+    _etag: str | None
+    # Map we last reported, and the map the local table currently mirrors
+    _map_name: str
+    _scope_map: str
+
+    _thread: threading.Thread | None
+    _loop: asyncio.AbstractEventLoop | None
+    _main_task: asyncio.Task | None
+    _wake: asyncio.Event | None
+    _stopping: bool
+    # Latest-wins outgoing update, written by the game thread only
+    _pending: dict | None
+    # The update the send loop handled last, compared by identity with _pending
+    _taken: dict | None
+    # What peers extrapolate from: the last update handed to the send loop
+    _last_sent: dict | None
+    # One keep-alive connection per server base url
+    _conns: dict[str, HttpConnection]
+    _stream_conn: HttpConnection | None
+    _stream_supported: bool
+    # Binary wire format, map indices are learned from binary snapshots
+    _binary: bool
+    _map_ids: dict[str, int]
+    # Map-sharded servers: map -> worker url, empty when the server is not sharded
+    _shard_urls: dict[str, str]
+    # Worker for maps missing from _shard_urls; the router itself serves no maps
+    _shard_default: str | None
+    _send_base: str | None
+    _stream_handoff: bool
+    # UDP position channel, None when the server does not offer one
+    _udp_sock: socket.socket | None
+    _udp_seq: int
+    _udp_last: dict | None
+    _udp_sent_at: float
+
     def __init__(self):
         self.base: str = GameSettings.ONLINE_SERVER_URL
         self.player_id = -1
+        self.updates_sent = 0
+        self.updates_skipped = 0
+        self.server_tick = -1
+        self.stats = NetStats()
         self.list_players = []
+        self._players = {}
+        self._remote = {}
+        self._remote_list = []
+        # 遊戲沒在畫的時候（例如切到別的 scene）不要無限累積
+        self._inbox = deque(maxlen=INBOX_LIMIT)
+        self._version = -1
+        self._etag = None
+        self._map_name = ""
+        self._scope_map = ""
+
+        self._thread = None
+        self._loop = None
+        self._main_task = None
+        self._wake = None
+        self._stopping = False
+        self._pending = None
+        self._taken = None
+        self._last_sent = None
+        self._conns = {}
+        self._stream_conn = None
+        self._stream_supported = True
+        self._binary = GameSettings.ONLINE_BINARY
+        self._map_ids = {}
+        self._shard_urls = {}
+        self._shard_default = None
+        self._send_base = None
+        self._stream_handoff = False
+        self._udp_sock = None
+        self._udp_seq = 0
+        self._udp_last = None
+        self._udp_sent_at = 0.0
 
-        self._fetch_thread = None
-        self._send_thread = None
-        self._stop_event = threading.Event()
-        self._lock = threading.Lock()
-        self._update_queue = queue.Queue(maxsize=10)
-        
         Logger.info("OnlineManager initialized")
-        
+
     def enter(self):
-        self.register()
+        # 註冊也在 I/O loop 裡做，不會卡住遊戲執行緒
         self.start()
-            
+
     def exit(self):
         self.stop()
-        
+
     def get_list_players(self) -> list[dict]:
-        with self._lock:
-            return list(self.list_players)
+        '''
+        The latest published player list. It is never modified after it is
+        published, so it can be read without copying; do not modify it.
+        '''
+        return self.list_players
+
+    def sample_remote_players(self, now: float) -> list[RemotePlayer]:
+        '''
+        Moves every remote player to where it should be drawn at `now` and
+        returns them. The returned list is reused, read it before the next call.
+        '''
+        remote = self._remote
+        inbox = self._inbox
+        pid = self.player_id
+        changed = False
+        while inbox:
+            t, players = inbox.popleft()
+            for key, p in players.items():
+                key = int(key)
+                if key == pid:
+                    continue
+                r = remote.get(key)
+                if r is None:
+                    r = remote[key] = RemotePlayer(key)
+                    changed = True
+                r.push(t, p["x"], p["y"], p.get("vx", 0.0), p.get("vy", 0.0), p["map"], p.get("dir", 0))
+        # list_players is published before its batch is queued, so it is at
+        # least as new as everything drained above
+        players_now = self.list_players
+        if len(remote) != len(players_now):
+            alive = {p["id"] for p in players_now}
+            for key in [key for key in remote if key not in alive]:
+                del remote[key]
+            changed = True
+        if changed:
+            self._remote_list[:] = remote.values()
+
+        render_time = now - INTERPOLATION_DELAY
+        for r in self._remote_list:
+            r.sample(render_time)
+        return self._remote_list
+
+    def update(self, x: float, y: float, map_name: str, direction: int = 0,
+               vx: float = 0.0, vy: float = 0.0) -> bool:
+        '''
+        Called every frame with the local player's position and velocity in
+        pixels per second. Returns whether an update is going out; most
+        frames only confirm that peers' extrapolation is still good enough.
+        '''
+        self._map_name = map_name
+        if self.player_id == -1:
+            return False
+
+        now = time.monotonic()
+        last = self._last_sent
+        if last is not None and not self._needs_send(last, x, y, map_name, direction, vx, vy, now):
+            self.updates_skipped += 1
+            return False
+
+        update_data = {"x": x, "y": y, "map": map_name, "dir": direction, "vx": vx, "vy": vy, "t": now}
+        self._last_sent = update_data
+        pending = self._pending
+        if pending is not None and pending is not self._taken:
+            self.stats.updates_dropped += 1
+        # 只保留最新的一筆，還沒送出的舊位置直接被取代
+        self._pending = update_data
+        self._wake_loop()
+        return True
+
+    @staticmethod
+    def _needs_send(last: dict, x: float, y: float, map_name: str, direction: int,
+                    vx: float, vy: float, now: float) -> bool:
+        if map_name != last["map"] or direction != last["dir"]:
+            return True
+        if abs(vx - last["vx"]) > VELOCITY_EPSILON or abs(vy - last["vy"]) > VELOCITY_EPSILON:
+            return True
+        elapsed = now - last["t"]
+        if (last["vx"] or last["vy"]) and elapsed >= KEYFRAME_INTERVAL:
+            return True
+        # Where peers currently draw us
+        dx = x - (last["x"] + last["vx"] * elapsed)
+        dy = y - (last["y"] + last["vy"] * elapsed)
+        return dx * dx + dy * dy > DRIFT_THRESHOLD * DRIFT_THRESHOLD
+
+    def _wake_loop(self) -> None:
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass    # the loop is shutting down
 
     # ------------------------------------------------------------------
-    # Threading and API Calling Below
+    # I/O loop and API Calling Below
     # ------------------------------------------------------------------
-    def register(self):
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="OnlineManagerIO", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping = True
+        loop, task = self._loop, self._main_task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _run(self) -> None:
         try:
-            url = f"{self.base}/register"
-            resp = requests.get(url, timeout=5)
-            resp.raise_for_status()
-            data = resp.json()
-            if resp.status_code == 200:
-                self.player_id = data["id"]
-                Logger.info(f"OnlineManager registered with id={self.player_id}")
-            else:
-                Logger.error("Registration failed:", data)
+            asyncio.run(self._main())
         except Exception as e:
-            Logger.warning(f"OnlineManager registration error: {e}")
-        return
+            Logger.error(f"OnlineManager I/O loop crashed: {e}")
 
-    def update(self, x: float, y: float, map_name: str) -> bool:
-        if self.player_id == -1:
-            return False
-        
+    async def _main(self) -> None:
+        self._main_task = asyncio.current_task()
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        try:
+            # stop() may have run before _loop was set
+            if self._stopping:
+                return
+            while not await self._register():
+                await asyncio.sleep(REGISTER_RETRY_INTERVAL)
+            loops = [self._send_loop(), self._fetch_loop()]
+            if GameSettings.ONLINE_STATS_CSV:
+                loops.append(self._export_loop(GameSettings.ONLINE_STATS_CSV))
+            await asyncio.gather(*loops)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop = None
+            for conn in self._conns.values():
+                conn.close()
+            self._conns = {}
+            if self._stream_conn is not None:
+                self._stream_conn.close()
+            if self._udp_sock is not None:
+                self._udp_sock.close()
+                self._udp_sock = None
+
+    def _conn(self, base: str) -> HttpConnection:
+        conn = self._conns.get(base)
+        if conn is None:
+            conn = self._conns[base] = HttpConnection(base, self.stats)
+        return conn
+
+    async def _request(self, base: str, method: str, path: str, body: bytes = b"",
+                       headers: dict[str, str] | None = None) -> HttpResponse:
+        resp = await self._timed(self._conn(base), method, path, body, headers)
+        location = resp.headers.get("location")
+        if resp.status == 307 and location:
+            # 舊版的 shard router 會把 /players 導向負責那張地圖的 worker
+            parts = urlsplit(location)
+            path = parts.path + (f"?{parts.query}" if parts.query else "")
+            resp = await self._timed(self._conn(f"{parts.scheme}://{parts.netloc}"), method, path, body, headers)
+        return resp
+
+    async def _timed(self, conn: HttpConnection, method: str, path: str, body: bytes,
+                     headers: dict[str, str] | None) -> HttpResponse:
+        start = time.monotonic()
         try:
-            self._update_queue.put_nowait({"x": x, "y": y, "map": map_name})
+            resp = await conn.request(method, path, body, headers)
+        except Exception:
+            self.stats.request_errors += 1
+            raise
+        self.stats.observe_rtt(time.monotonic() - start)
+        return resp
+
+    def diagnostics(self, now: float) -> dict:
+        '''One row of network diagnostics, with the keys of net_stats.CSV_FIELDS.'''
+        stats = self.stats
+        pending = self._pending
+        queued = len(self._inbox) + (pending is not None and pending is not self._taken)
+        return {
+            "time": round(time.time(), 3),
+            "rtt_last_ms": round(stats.rtt_last * 1000, 2),
+            "rtt_p50_ms": round(stats.rtt_percentile(0.50) * 1000, 2),
+            "rtt_p95_ms": round(stats.rtt_percentile(0.95) * 1000, 2),
+            "requests": stats.requests,
+            "request_errors": stats.request_errors,
+            "connects": stats.connects,
+            "bytes_sent": stats.bytes_sent,
+            "bytes_received": stats.bytes_received,
+            "queue_depth": queued,
+            "updates_sent": self.updates_sent,
+            "updates_skipped": self.updates_skipped,
+            "updates_dropped": stats.updates_dropped,
+            "batches_dropped": stats.batches_dropped,
+            "snapshot_age_ms": round(stats.snapshot_age(now) * 1000, 1),
+            "server_tick": self.server_tick,
+            "players": len(self.list_players),
+            "frame_max_ms": round(stats.frame_max * 1000, 2),
+        }
+
+    async def _export_loop(self, path: str) -> None:
+        try:
+            exporter = NetStatsCsv(path)
+            Logger.info(f"OnlineManager: writing network stats to {path}")
+            while True:
+                await asyncio.sleep(GameSettings.ONLINE_STATS_INTERVAL)
+                exporter.write(self.diagnostics(time.monotonic()))
+                self.stats.frame_max = 0.0
+        except OSError as e:
+            Logger.warning(f"OnlineManager stats export error: {e}")
+
+    async def _register(self) -> bool:
+        try:
+            resp = await self._request(self.base, "GET", "/register")
+            if resp.status != 200:
+                Logger.error("Registration failed:", resp.body)
+                return False
+            data = resp.json()
+            # 新的 id 在伺服器上還沒有任何位置，上一次連線送過的東西都不算數
+            self._reset_send_state()
+            self.player_id = data["id"]
+            Logger.info(f"OnlineManager registered with id={self.player_id}")
+            await self._fetch_shards()
+            if GameSettings.ONLINE_UDP and data.get("udp_port"):
+                await self._open_udp(int(data["udp_port"]))
             return True
-        except queue.Full:
+        except Exception as e:
+            Logger.warning(f"OnlineManager registration error: {e}")
             return False
 
-    def start(self) -> None:
-        if (self._fetch_thread and self._fetch_thread.is_alive()) or \
-           (self._send_thread and self._send_thread.is_alive()):
+    def _reset_send_state(self) -> None:
+        '''
+        Forgets what was sent under the previous player id, so the next
+        update() goes out even if the player has not moved since.
+        '''
+        self._last_sent = None
+        self._pending = None
+        self._taken = None
+        self._udp_last = None
+
+    async def _fetch_shards(self) -> None:
+        resp = await self._request(self.base, "GET", "/shards")
+        if resp.status != 200:
             return
-        
-        self._stop_event.clear()
-        
-        self._fetch_thread = threading.Thread(
-            target=self._fetch_loop,
-            name="OnlineManagerFetcher",
-            daemon=True
-        )
-        self._fetch_thread.start()
-        
-        self._send_thread = threading.Thread(
-            target=self._send_loop,
-            name="OnlineManagerSender",
-            daemon=True
-        )
-        self._send_thread.start()
+        data = resp.json()
+        shards = data.get("shards", [])
+        self._shard_urls = {m: shard["url"] for shard in shards for m in shard["maps"]}
+        self._shard_default = data.get("default") or (shards[0]["url"] if shards else None)
+        Logger.info(f"OnlineManager: sharded server with {len(shards)} workers")
 
-    def stop(self) -> None:
-        self._stop_event.set()
-        if self._fetch_thread and self._fetch_thread.is_alive():
-            self._fetch_thread.join(timeout=2)
-        if self._send_thread and self._send_thread.is_alive():
-            self._send_thread.join(timeout=2)
-
-    def _fetch_loop(self) -> None:
-        while not self._stop_event.wait(POLL_INTERVAL):
-            self._fetch_players()
-    
-    def _send_loop(self) -> None:
-        while not self._stop_event.is_set():
+    async def _open_udp(self, port: int) -> None:
+        host = urlsplit(self.base).hostname or "localhost"
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect((host, port))
+        sock.setblocking(False)
+        self._udp_sock = sock
+        await self._fetch_map_table()
+        Logger.info(f"OnlineManager: position updates over UDP port {port}")
+
+    def _url_for(self, map_name: str) -> str:
+        url = self._shard_urls.get(map_name)
+        if url is None:
+            url = self._shard_default or self.base
+        return url
+
+    async def _handoff(self, old_base: str) -> None:
+        # 換到另一個 shard：通知舊的 worker 移除玩家，並關掉舊的串流，
+        # fetch loop 隨即連到新的 worker
+        self._map_ids = {}
+        self._stream_handoff = True
+        if self._stream_conn is not None:
+            self._stream_conn.close()
+        try:
+            await self._request(old_base, "POST", "/players/leave", json.dumps({"id": self.player_id}).encode(),
+                                {"Content-Type": "application/json"})
+        except Exception as e:
+            Logger.warning(f"OnlineManager leave error: {e}")
+
+    async def _send_loop(self) -> None:
+        wake = self._wake
+        while True:
+            timeout = None
+            if self._udp_last is not None:
+                timeout = max(0.0, self._udp_sent_at + UDP_RESEND_INTERVAL - time.monotonic())
             try:
-                update_data = self._update_queue.get(timeout=0.1)
-                self._send_update(update_data)
-            except queue.Empty:
+                await asyncio.wait_for(wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                if self._udp_last is not None:
+                    self._send_datagram(self._udp_last)
+                continue
+            wake.clear()
+            # 不清掉 _pending（那是遊戲執行緒的），用 identity 判斷是不是新的
+            update_data = self._pending
+            if update_data is None or update_data is self._taken:
                 continue
-            
-    def _send_update(self, update_data: dict) -> None:
+            self._taken = update_data
+
+            base = self._url_for(update_data["map"])
+            if self._send_base is not None and base != self._send_base:
+                await self._handoff(self._send_base)
+            self._send_base = base
+
+            # UDP 遺失也會被下一筆取代
+            if self._udp_sock is not None and update_data["map"] in self._map_ids:
+                self._send_datagram(update_data)
+                continue
+            self._udp_last = None
+            await self._send_update(update_data)
+
+    def _send_datagram(self, update_data: dict) -> None:
+        self._udp_seq += 1
+        payload = protocol.encode_datagram(self._udp_seq, [(
+            self.player_id, update_data["x"], update_data["y"],
+            self._map_ids[update_data["map"]], update_data["dir"], update_data["vx"], update_data["vy"]
+        )])
+        try:
+            self._udp_sock.send(payload)
+            self.updates_sent += 1
+            self.stats.bytes_sent += len(payload)
+        except OSError as e:
+            Logger.warning(f"OnlineManager UDP send error: {e}")
+        self._udp_last = update_data
+        self._udp_sent_at = time.monotonic()
+
+    async def _send_update(self, update_data: dict) -> None:
         if self.player_id == -1:
             return
-        
-        url = f"{self.base}/players"
-        body = {
-            "id": self.player_id,
-            "x": update_data["x"],
-            "y": update_data["y"],
-            "map": update_data["map"]
-        }
-        
+
+        base = self._url_for(update_data["map"])
+        map_index = self._map_ids.get(update_data["map"])
+
         try:
-            resp = requests.post(url, json=body, timeout=5)
-            if resp.status_code != 200:
-                Logger.warning(f"Update failed: {resp.status_code} {resp.text}")
+            if self._binary and map_index is not None:
+                payload = protocol.encode_updates([(
+                    self.player_id, update_data["x"], update_data["y"], map_index, update_data["dir"],
+                    update_data["vx"], update_data["vy"]
+                )])
+                resp = await self._request(base, "POST", "/players", payload,
+                                           {"Content-Type": protocol.CONTENT_TYPE})
+            else:
+                body = {
+                    "id": self.player_id,
+                    "x": update_data["x"],
+                    "y": update_data["y"],
+                    "map": update_data["map"],
+                    "dir": update_data["dir"],
+                    "vx": update_data["vx"],
+                    "vy": update_data["vy"]
+                }
+                resp = await self._request(base, "POST", "/players", json.dumps(body).encode(),
+                                           {"Content-Type": "application/json"})
+            self.updates_sent += 1
+            if resp.status not in (200, 204):
+                Logger.warning(f"Update failed: {resp.status} {resp.body!r}")
+            elif (self._binary or self._udp_sock is not None) and map_index is None:
+                await self._fetch_map_table()
         except Exception as e:
             Logger.warning(f"Online update error: {e}")
-    
-    def _fetch_players(self) -> None:
+
+    async def _fetch_map_table(self) -> None:
+        resp = await self._request(self._url_for(self._map_name), "GET", "/maps")
+        if resp.status == 200:
+            map_names = resp.json().get("maps", [])
+            self._map_ids = {name: i for i, name in enumerate(map_names)}
+        else:
+            # 伺服器不支援 binary 格式
+            self._binary = False
+
+    async def _fetch_loop(self) -> None:
+        # 優先使用 server push 串流，伺服器不支援或斷線時退回 polling
+        next_stream_try = 0.0
+        while True:
+            # On a sharded server the stream must go to the worker of our map
+            ready = self._map_name or not self._shard_urls
+            if ready and self._stream_supported and time.monotonic() >= next_stream_try:
+                await self._stream_players()
+                if self._stream_handoff:
+                    self._stream_handoff = False
+                else:
+                    next_stream_try = time.monotonic() + STREAM_RETRY_INTERVAL
+                continue
+            await asyncio.sleep(POLL_INTERVAL)
+            await self._fetch_players()
+
+    async def _fetch_players(self) -> None:
         try:
-            url = f"{self.base}/players"
-            resp = requests.get(url, timeout=5)
-            resp.raise_for_status()
-            all_players = resp.json().get("players", [])
-
-            pid = self.player_id
-            filtered = [p for key, p in all_players.items() if int(key) != pid]
-            with self._lock:
-                self.list_players = filtered
-            
+            # 只要求同一張地圖上、上次版本之後有變動的玩家
+            map_name = self._map_name
+            if map_name != self._scope_map:
+                self._version = -1
+            params: dict[str, object] = {}
+            if map_name:
+                params["map"] = map_name
+            if self._version >= 0:
+                params["since"] = self._version
+            path = f"/players?{urlencode(params)}" if params else "/players"
+            headers = {"Accept": protocol.CONTENT_TYPE} if self._binary else {}
+            if self._version >= 0 and self._etag:
+                # 地圖上沒有任何變動時伺服器回 304
+                headers["If-None-Match"] = self._etag
+            resp = await self._request(self._url_for(map_name), "GET", path, headers=headers)
+            if resp.status == 304:
+                self.stats.snapshot_at = time.monotonic()
+                return
+            if resp.status != 200:
+                raise HttpError(f"{resp.status} {resp.body[:200]!r}")
+            self._etag = resp.headers.get("etag")
+            self.server_tick = int(resp.headers.get("x-server-tick", self.server_tick))
+            if resp.headers.get("content-type", "").startswith(protocol.CONTENT_TYPE):
+                data, map_names = protocol.decode_snapshot(resp.body)
+                self._map_ids = {name: i for i, name in enumerate(map_names)}
+                self._merge_players(data)
+            else:
+                self._merge_players(resp.json())
+
         except Exception as e:
-            Logger.warning(f"OnlineManager fetch error: {e}")
\ No newline at end of file
+            Logger.warning(f"OnlineManager fetch error: {e}")
+
+    async def _stream_players(self) -> None:
+        '''
+        Reads server-sent events from /players/stream until the connection
+        drops. Each event carries the same payload as a delta poll.
+        '''
+        conn = self._stream_conn = HttpConnection(self._url_for(self._map_name), self.stats)
+        try:
+            data_lines: list[str] = []
+            async for line in conn.stream(f"/players/stream?id={self.player_id}", None, STREAM_READ_TIMEOUT):
+                if line:
+                    if line.startswith("data:"):
+                        data_lines.append(line[5:].lstrip())
+                    elif line.startswith(":"):
+                        # heartbeat: nothing changed, our copy is current
+                        self.stats.snapshot_at = time.monotonic()
+                    continue
+                if data_lines:
+                    self._merge_players(json.loads("\n".join(data_lines)))
+                    data_lines = []
+        except HttpError as e:
+            if e.args and e.args[0] == 404:
+                self._stream_supported = False
+                Logger.info("OnlineManager: server has no player stream, polling instead")
+            else:
+                Logger.warning(f"OnlineManager stream error: {e}")
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+            if not self._stream_handoff:
+                Logger.warning(f"OnlineManager stream error: {e!r}")
+        finally:
+            self._stream_conn = None
+
+    def _merge_players(self, data: dict) -> None:
+        # A response without "full": False is a whole snapshot and replaces the table
+        if data.get("full", True):
+            self._players = {}
+        changed = data.get("players", {})
+        for key, p in changed.items():
+            self._players[int(key)] = p
+        for key in data.get("removed", []):
+            self._players.pop(int(key), None)
+        self._version = int(data.get("version", -1))
+        self._scope_map = data.get("map", "")
+        self.server_tick = int(data.get("tick", self.server_tick))
+        self.stats.snapshot_at = time.monotonic()
+
+        pid = self.player_id
+        # 先換上新的 list 再排入位置，遊戲執行緒看到的 list 一定不比 inbox 舊
+        self.list_players = [p for key, p in self._players.items() if key != pid]
+        if changed:
+            if len(self._inbox) == INBOX_LIMIT:
+                self.stats.batches_dropped += 1
+            self._inbox.append((time.monotonic(), changed))
@@ -0,0 +1,89 @@
+from array import array
+
+# Samples kept per remote player, a ring buffer that is never reallocated
+HISTORY_SIZE = 16
+# Stop extrapolating a player we have not heard from in this long (seconds)
+MAX_EXTRAPOLATION = 2.0
+
+
+class RemotePlayer:
+    '''
+    Timestamped position history of one online player.
+
+    The I/O loop queues every batch of positions it receives with the local
+    receive time; the game thread pushes them here in
+    OnlineManager.sample_remote_players() and draws the player at
+    `render_time`, a little in the past, so there are usually two samples
+    around it to interpolate between. When render_time is past the newest
+    sample (a dead-reckoned player who is on track does not send), the
+    newest sample is extrapolated with its velocity.
+
+    The ring buffer is preallocated and sample() only writes the result
+    into self.x / self.y, so drawing allocates nothing per player.
+    '''
+    __slots__ = ("id", "map", "dir", "x", "y", "_t", "_xs", "_ys", "_vxs", "_vys", "_head", "_count")
+
+    id: int
+    map: str
+    dir: int
+    # Position to draw, written by sample()
+    x: float
+    y: float
+
+    def __init__(self, pid: int):
+        self.id = pid
+        self.map = ""
+        self.dir = 0
+        self.x = 0.0
+        self.y = 0.0
+        zeros = bytes(8 * HISTORY_SIZE)
+        self._t = array("d", zeros)
+        self._xs = array("d", zeros)
+        self._ys = array("d", zeros)
+        self._vxs = array("d", zeros)
+        self._vys = array("d", zeros)
+        self._head = -1     # index of the newest sample
+        self._count = 0
+
+    def push(self, t: float, x: float, y: float, vx: float, vy: float, map_name: str, direction: int) -> None:
+        if map_name != self.map:
+            # 換地圖時不要從舊地圖的位置內插過來
+            self._count = 0
+            self.map = map_name
+            self.x, self.y = x, y
+        self.dir = direction
+        head = (self._head + 1) % HISTORY_SIZE
+        self._t[head] = t
+        self._xs[head] = x
+        self._ys[head] = y
+        self._vxs[head] = vx
+        self._vys[head] = vy
+        self._head = head
+        if self._count < HISTORY_SIZE:
+            self._count += 1
+
+    def sample(self, render_time: float) -> None:
+        if self._count == 0:
+            return
+        t = self._t
+        i = self._head
+        if render_time >= t[i]:
+            elapsed = min(render_time - t[i], MAX_EXTRAPOLATION)
+            self.x = self._xs[i] + self._vxs[i] * elapsed
+            self.y = self._ys[i] + self._vys[i] * elapsed
+            return
+
+        # Walk back to the newest sample at or before render_time
+        newer = i
+        for _ in range(self._count - 1):
+            i = (i - 1) % HISTORY_SIZE
+            if t[i] <= render_time:
+                span = t[newer] - t[i]
+                alpha = (render_time - t[i]) / span if span > 0 else 1.0
+                self.x = self._xs[i] + (self._xs[newer] - self._xs[i]) * alpha
+                self.y = self._ys[i] + (self._ys[newer] - self._ys[i]) * alpha
+                return
+            newer = i
+        # Older than everything we remember
+        self.x = self._xs[newer]
+        self.y = self._ys[newer]
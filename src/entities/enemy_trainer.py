@@ -168,4 +168,5 @@ class EnemyTrainer(Entity):
         base["classification"] = self.classification.value
         base["facing"] = self.direction.name
         base["max_tiles"] = self.max_tiles
+        base["id"] = self.trainer_id
         return base
\ No newline at end of file
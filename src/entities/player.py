@@ -10,10 +10,13 @@ from typing import override
 class Player(Entity):
     speed: float = 5 * GameSettings.TILE_SIZE
     game_manager: GameManager
+    # 碰撞處理後實際的移動速度 (pixel/s)，給連線的其他玩家推算位置
+    velocity: Position
 
     def __init__(self, x: float, y: float, game_manager: GameManager) -> None:
         sprite_path = "character/ow3.png"
         super().__init__(x, y, game_manager, sprite_path)
+        self.velocity = Position(0, 0)
         
 
     @override
@@ -38,6 +41,7 @@ class Player(Entity):
             dis.y = dis.y / length * self.speed * dt
 
         # 預計新位置
+        old_x, old_y = self.position.x, self.position.y
         new_x = self.position.x + dis.x
         new_y = self.position.y + dis.y    
       
@@ -59,6 +63,8 @@ class Player(Entity):
       
         ## 給 Entity 判斷方向
         self.dis = dis
+        if dt > 0:
+            self.velocity = Position((self.position.x - old_x) / dt, (self.position.y - old_y) / dt)
         
         '''
         [TODO HACKATHON 2]
@@ -0,0 +1,62 @@
+import pygame as pg
+
+# 文字每秒只重新 render 幾次，數字跳太快也看不清楚
+REFRESH_INTERVAL = 0.25
+
+class NetOverlay:
+    '''
+    F3 network diagnostics panel in the top-left corner, fed by
+    OnlineManager.diagnostics().
+    '''
+    def __init__(self, font_path: str, font_size: int = 16):
+        self.font = pg.font.Font(font_path, font_size)
+        self.is_open = False
+        self._lines: list[pg.Surface] = []
+        self._panel: pg.Surface | None = None
+        self._refreshed_at = -REFRESH_INTERVAL
+
+        self.COLOR_TEXT = (255, 255, 255)
+        self.COLOR_WARN = (255, 200, 0)
+
+    def toggle(self):
+        self.is_open = not self.is_open
+        self._refreshed_at = -REFRESH_INTERVAL
+
+    def draw(self, screen: pg.Surface, row: dict | None, now: float):
+        if not self.is_open:
+            return
+        if now - self._refreshed_at >= REFRESH_INTERVAL:
+            self._refreshed_at = now
+            self._render(row)
+
+        x, y = 10, 10
+        screen.blit(self._panel, (x - 5, y - 5))
+        for line in self._lines:
+            screen.blit(line, (x, y))
+            y += line.get_height() + 2
+
+    def _render(self, row: dict | None):
+        if row is None:
+            texts = [("offline", False)]
+        else:
+            texts = [
+                (f"rtt {row['rtt_last_ms']:.1f} ms  p50 {row['rtt_p50_ms']:.1f}  p95 {row['rtt_p95_ms']:.1f}",
+                 row["rtt_p95_ms"] > 100),
+                (f"requests {row['requests']}  errors {row['request_errors']}  connects {row['connects']}",
+                 row["request_errors"] > 0),
+                (f"sent {row['bytes_sent'] / 1024:.1f} KB  received {row['bytes_received'] / 1024:.1f} KB", False),
+                (f"updates sent {row['updates_sent']}  skipped {row['updates_skipped']}", False),
+                (f"queue {row['queue_depth']}  dropped {row['updates_dropped']} out / {row['batches_dropped']} in",
+                 row["batches_dropped"] > 0),
+                # 串流沒有變動時只有每 15 秒的 heartbeat，age 變大不一定是卡住
+                (f"snapshot age {row['snapshot_age_ms']:.0f} ms  tick {row['server_tick']}", False),
+                (f"players {row['players']}", False),
+            ]
+        self._lines = [self.font.render(text, True, self.COLOR_WARN if warn else self.COLOR_TEXT)
+                       for text, warn in texts]
+
+        width = max(line.get_width() for line in self._lines) + 10
+        height = sum(line.get_height() + 2 for line in self._lines) + 8
+        self._panel = pg.Surface((width, height))
+        self._panel.set_alpha(150)
+        self._panel.fill((0, 0, 0))
@@ -0,0 +1,88 @@
+import pygame as pg
+
+
+class CollisionGrid:
+    '''
+    One byte per tile, 1 where a collision tile is. check(rect) only looks
+    at the tiles the rect overlaps, so a player-sized rect costs a handful
+    of lookups however big the map is.
+
+    Matches Rect.colliderect against a list of tile rects exactly: edges
+    that only touch do not collide, empty rects never collide, rects with a
+    negative size are normalized first, and nothing outside the map
+    collides.
+    '''
+    width: int
+    height: int
+    tile_size: int
+    cells: bytearray
+
+    def __init__(self, width: int, height: int, tile_size: int, cells: bytearray | None = None):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.cells = cells if cells is not None else bytearray(width * height)
+
+    def add(self, x: int, y: int) -> None:
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.cells[y * self.width + x] = 1
+
+    def check(self, rect: pg.Rect) -> bool:
+        tiles = self._tiles_under(rect)
+        if tiles is None:
+            return False
+        x0, y0, x1, y1 = tiles
+        cells = self.cells
+        width = self.width
+        for ty in range(y0, y1 + 1):
+            row = ty * width
+            # 一次檢查整排，find 在 C 裡面跑
+            if cells.find(1, row + x0, row + x1 + 1) != -1:
+                return True
+        return False
+
+    def rects(self, area: pg.Rect | None = None) -> list[pg.Rect]:
+        '''
+        One rect per blocked tile, e.g. for drawing hitboxes. With `area`
+        only the tiles it overlaps are visited, so a screen-sized area costs
+        the same on any map.
+        '''
+        if area is None:
+            tiles = (0, 0, self.width - 1, self.height - 1) if self.cells else None
+        else:
+            tiles = self._tiles_under(area)
+        if tiles is None:
+            return []
+        x0, y0, x1, y1 = tiles
+        size = self.tile_size
+        cells = self.cells
+        width = self.width
+        rects = []
+        for ty in range(y0, y1 + 1):
+            row = ty * width
+            end = row + x1 + 1
+            i = cells.find(1, row + x0, end)
+            while i != -1:
+                rects.append(pg.Rect((i - row) * size, ty * size, size, size))
+                i = cells.find(1, i + 1, end)
+        return rects
+
+    def _tiles_under(self, rect: pg.Rect) -> tuple[int, int, int, int] | None:
+        '''Inclusive tile range the rect overlaps, clipped to the map; None if empty.'''
+        x, y, w, h = rect
+        if w < 0:
+            x, w = x + w, -w
+        if h < 0:
+            y, h = y + h, -h
+        if w == 0 or h == 0:
+            return None
+
+        size = self.tile_size
+        # Tiles overlapping [x, x + w) x [y, y + h), clipped to the map
+        x0 = max(x // size, 0)
+        x1 = min((x + w - 1) // size, self.width - 1)
+        y0 = max(y // size, 0)
+        y1 = min((y + h - 1) // size, self.height - 1)
+        if x0 > x1 or y0 > y1:
+            return None
+        return x0, y0, x1, y1
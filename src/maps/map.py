@@ -1,65 +1,100 @@
 import pygame as pg
 import pytmx
+from array import array
+from collections import OrderedDict
 
 from src.utils import load_tmx, Position, GameSettings, PositionCamera, Teleport
+from .collision_grid import CollisionGrid
+from . import map_cache
+from .map_cache import BakedMap
+
+# The baked map is kept as CHUNK_TILES x CHUNK_TILES tile surfaces (512 px
+# with 64 px tiles); a 1280 x 720 view touches at most 4 x 3 of them
+CHUNK_TILES = 8
+# Baked chunks kept per map, least recently drawn are evicted first
+MAX_CHUNKS = 32
 
 class Map:
     # Map Properties
     path_name: str
-    tmxdata: pytmx.TiledMap
+    # None when the map came from the baked map cache
+    tmxdata: pytmx.TiledMap | None
+    # Size in tiles
+    width: int
+    height: int
     # Position Argument
     spawn: Position
     teleporters: list[Teleport]
     # Rendering Properties
-    _surface: pg.Surface
-    _collision_map: list[pg.Rect]
-    _grass_map: list[pg.Rect]
+    # Tile layers, tile images and grids, from the .tmx or the map cache
+    _baked: BakedMap
+    # (chunk x, chunk y) -> baked chunk, None for an empty one; in LRU order
+    _chunks: "OrderedDict[tuple[int, int], pg.Surface | None]"
+    # gid -> tile image in the display format
+    _tile_images: dict[int, pg.Surface | None]
+    # Collision and grass tiles, answer the rect queries and list the hitboxes in view
+    _collision_grid: CollisionGrid
+    _grass_grid: CollisionGrid
 
     def __init__(self, path: str, tp: list[Teleport], spawn: Position):
         self.path_name = path
-        self.tmxdata = load_tmx(path)
         self.spawn = spawn
         self.teleporters = tp
+        self.tmxdata = None
 
-        pixel_w = self.tmxdata.width * GameSettings.TILE_SIZE
-        pixel_h = self.tmxdata.height * GameSettings.TILE_SIZE
+        # 有快取就完全不用解析 .tmx
+        baked = map_cache.load(path)
+        if baked is None:
+            self.tmxdata = load_tmx(path)
+            baked = self._bake_tmx()
+            map_cache.store(path, baked)
+        self._baked = baked
+        self.width = baked.width
+        self.height = baked.height
 
-        # Prebake the map
-        self._surface = pg.Surface((pixel_w, pixel_h), pg.SRCALPHA)
-        self._render_all_layers(self._surface)
-        # Prebake the collision map
-        self._collision_map = self._create_collision_map()
-        self._grass_map = self._create_grass_map()
+        # The map is baked chunk by chunk when it first comes into view
+        self._chunks = OrderedDict()
+        self._tile_images = {}
+        self._collision_grid = CollisionGrid(self.width, self.height, GameSettings.TILE_SIZE, baked.collision)
+        self._grass_grid = CollisionGrid(self.width, self.height, GameSettings.TILE_SIZE, baked.grass)
 
     def update(self, dt: float):
         return
 
     def draw(self, screen: pg.Surface, camera: PositionCamera):
-        screen.blit(self._surface, camera.transform_position(Position(0, 0)))
+        # 只畫和鏡頭範圍有交集的 chunk，成本只跟螢幕大小有關
+        view = pg.Rect(camera.x, camera.y, screen.get_width(), screen.get_height())
+        chunk_px = CHUNK_TILES * GameSettings.TILE_SIZE
+        for cx, cy in self._chunks_in_view(view):
+            chunk = self._chunk(cx, cy)
+            if chunk is not None:
+                screen.blit(chunk, (cx * chunk_px - camera.x, cy * chunk_px - camera.y))
         
         # Draw the hitboxes collision map
         if GameSettings.DRAW_HITBOXES:
-            for rect in self._collision_map:
+            for rect in self._collision_grid.rects(view):
                 pg.draw.rect(screen, (255, 0, 0), camera.transform_rect(rect), 1)
 
-            for rect in self._grass_map:
-                pg.draw.rect(screen, (0, 255, 0), camera.transform_rect(rect), 1)    
+            for rect in self._grass_grid.rects(view):
+                pg.draw.rect(screen, (0, 255, 0), camera.transform_rect(rect), 1)
         
+    def prebake(self, view: pg.Rect) -> None:
+        '''Bakes the chunks the view will draw, e.g. before the map is shown.'''
+        for cx, cy in self._chunks_in_view(view):
+            self._chunk(cx, cy)
+
     def check_collision(self, rect: pg.Rect) -> bool:
         '''
         [TODO HACKATHON 4]
         Return True if collide if rect param collide with self._collision_map
         Hint: use API colliderect and iterate each rectangle to check
         '''
-        ## colliderect 是 pygame 的 API，用來檢查兩個矩形是否有交集
-        for obj in self._collision_map:
-            if rect.colliderect(obj):
-                return True
-
-        return False
+        ## 原本逐一 colliderect 每個碰撞格子，地圖越大越慢；
+        ## 改查 rect 蓋到的那幾格，結果和 colliderect 相同
+        return self._collision_grid.check(rect)
     
     def check_in_grass(self, rect: pg.Rect) -> bool:
-        return rect.collidelist(self._grass_map) != -1
+        return self._grass_grid.check(rect)
 
     def check_teleport(self, pos: Position) -> Teleport | None:
         '''[TODO HACKATHON 6] 
@@ -82,23 +117,101 @@ class Map:
 
         return None
 
-    def _render_all_layers(self, target: pg.Surface) -> None:
-        for layer in self.tmxdata.visible_layers:
+    def _chunk(self, cx: int, cy: int) -> pg.Surface | None:
+        key = (cx, cy)
+        chunks = self._chunks
+        if key in chunks:
+            chunks.move_to_end(key)
+            return chunks[key]
+        surface = self._bake_chunk(cx, cy)
+        chunks[key] = surface
+        # 最久沒畫到的 chunk 離玩家最遠，超過上限就丟掉，之後需要再重新 bake
+        while len(chunks) > MAX_CHUNKS:
+            chunks.popitem(last=False)
+        return surface
+
+    def _chunks_in_view(self, view: pg.Rect) -> list[tuple[int, int]]:
+        chunk_px = CHUNK_TILES * GameSettings.TILE_SIZE
+        cx0 = max(view.left // chunk_px, 0)
+        cy0 = max(view.top // chunk_px, 0)
+        cx1 = min((view.right - 1) // chunk_px, (self.width - 1) // CHUNK_TILES)
+        cy1 = min((view.bottom - 1) // chunk_px, (self.height - 1) // CHUNK_TILES)
+        return [(cx, cy) for cy in range(cy0, cy1 + 1) for cx in range(cx0, cx1 + 1)]
+
+    def _bake_chunk(self, cx: int, cy: int) -> pg.Surface | None:
+        '''
+        Renders the tiles of one chunk from every visible tile layer.
+        Returns None for a chunk without any tile.
+        '''
+        tile = GameSettings.TILE_SIZE
+        x0, y0 = cx * CHUNK_TILES, cy * CHUNK_TILES
+        width = self.width
+        x1 = min(x0 + CHUNK_TILES, width)
+        y1 = min(y0 + CHUNK_TILES, self.height)
+        opaque = self._baked.opaque
+
+        surface = pg.Surface(((x1 - x0) * tile, (y1 - y0) * tile), pg.SRCALPHA)
+        empty = True
+        # Cells already covered by an opaque tile
+        covered = bytearray((x1 - x0) * (y1 - y0))
+        for data in self._baked.layers:
+            for y in range(y0, y1):
+                row = y * width
+                for x in range(x0, x1):
+                    gid = data[row + x]
+                    image = self._tile_image(gid)
+                    if image is not None:
+                        surface.blit(image, ((x - x0) * tile, (y - y0) * tile))
+                        empty = False
+                        if opaque[gid]:
+                            covered[(y - y0) * (x1 - x0) + (x - x0)] = 1
+        if empty:
+            return None
+
+        if pg.display.get_surface() is None:
+            return surface
+        # 轉成螢幕的格式 blit 才快；完全不透明的 chunk 連 alpha 都不用
+        if 0 not in covered:
+            return surface.convert()
+        return surface.convert_alpha()
+
+    def _tile_image(self, gid: int) -> pg.Surface | None:
+        if gid == 0:
+            return None
+        if gid in self._tile_images:
+            return self._tile_images[gid]
+        image = self._baked.tiles.get(gid)
+        if image is not None and pg.display.get_surface() is not None:
+            image = image.convert_alpha()
+        self._tile_images[gid] = image
+        return image
+
+    def _bake_tmx(self) -> BakedMap:
+        '''Flattens the tile layers and scales every tile image used once.'''
+        tmx = self.tmxdata
+        layers = []
+        for layer in tmx.visible_layers:
             if isinstance(layer, pytmx.TiledTileLayer):
-                self._render_tile_layer(target, layer)
-            # elif isinstance(layer, pytmx.TiledImageLayer) and layer.image:
-            #     target.blit(layer.image, (layer.x or 0, layer.y or 0))
- 
-    def _render_tile_layer(self, target: pg.Surface, layer: pytmx.TiledTileLayer) -> None:
-        for x, y, gid in layer:
-            if gid == 0:
-                continue
-            image = self.tmxdata.get_tile_image_by_gid(gid)
+                layers.append(array("I", [gid for row in layer.data for gid in row]))
+
+        size = GameSettings.TILE_SIZE
+        tiles = {}
+        opaque = {}
+        for gid in sorted(set().union(*layers) - {0}):
+            image = tmx.get_tile_image_by_gid(gid)
             if image is None:
                 continue
+            image = pg.transform.scale(image, (size, size))
+            tiles[gid] = image
+            opaque[gid] = pg.mask.from_surface(image, 254).count() == size * size
 
-            image = pg.transform.scale(image, (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE))
-            target.blit(image, (x * GameSettings.TILE_SIZE, y * GameSettings.TILE_SIZE))
+        collision = CollisionGrid(tmx.width, tmx.height, size)
+        for rect in self._create_collision_map():
+            collision.add(rect.x // size, rect.y // size)
+        grass = CollisionGrid(tmx.width, tmx.height, size)
+        for rect in self._create_grass_map():
+            grass.add(rect.x // size, rect.y // size)
+        return BakedMap(tmx.width, tmx.height, layers, tiles, opaque, collision.cells, grass.cells)
     
     def _create_collision_map(self) -> list[pg.Rect]:
 
@@ -0,0 +1,195 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pygame as pg
+
+from src.utils import GameSettings, Logger
+from src.utils.loader import ASSETS_DIR
+
+# Bump when the file layout or what gets baked changes
+CACHE_FORMAT = 1
+MAGIC = b"MGMAPC\x00\x01"
+HEADER = struct.Struct("<8sI")     # magic, length of the JSON metadata
+ALIGN = 8
+
+_TILESET_SOURCE = re.compile(rb'<tileset[^>]*\ssource="([^"]+)"')
+_IMAGE_SOURCE = re.compile(rb'<image[^>]*\ssource="([^"]+)"')
+
+
+@dataclass
+class BakedMap:
+    '''
+    Everything Map needs from a .tmx, with tiles already scaled to TILE_SIZE.
+    Loaded from the cache, the arrays and tile pixels are views into the
+    memory-mapped file, so only the pages actually used are read.
+    '''
+    width: int
+    height: int
+    # One flat row-major gid array per visible tile layer, bottom first
+    layers: list
+    # gid -> RGBA tile image, and whether it has no transparent pixel
+    tiles: dict[int, pg.Surface]
+    opaque: dict[int, bool]
+    # One byte per tile, see CollisionGrid
+    collision: bytearray
+    grass: bytearray
+    # Keeps the memory map alive while the views above are in use
+    _mmap: mmap.mmap | None = field(default=None, repr=False)
+
+
+def cache_key(path: str) -> str:
+    '''
+    Hash of the .tmx, the .tsx files it references, their tileset images
+    and TILE_SIZE. Found with a regex so no XML is parsed.
+    '''
+    digest = hashlib.sha256(f"{CACHE_FORMAT}:{GameSettings.TILE_SIZE}".encode())
+    tmx = ASSETS_DIR / "maps" / path
+    pending = [tmx]
+    seen = set()
+    while pending:
+        file = pending.pop()
+        if file in seen:
+            continue
+        seen.add(file)
+        data = file.read_bytes()
+        digest.update(str(file.name).encode() + b"\0" + data)
+        for match in _TILESET_SOURCE.findall(data) + _IMAGE_SOURCE.findall(data):
+            pending.append(file.parent / match.decode())
+    return digest.hexdigest()
+
+
+def cache_file(path: str, key: str) -> Path:
+    return Path(GameSettings.MAP_CACHE_DIR) / f"{Path(path).stem}-{key[:16]}.bin"
+
+
+def load(path: str) -> BakedMap | None:
+    '''Returns the cached map, or None when there is no valid entry.'''
+    if not GameSettings.MAP_CACHE_DIR:
+        return None
+    try:
+        key = cache_key(path)
+        file = cache_file(path, key)
+        if not file.exists():
+            return None
+        with open(file, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, meta_len = HEADER.unpack_from(mm, 0)
+            meta = json.loads(mm[HEADER.size:HEADER.size + meta_len])
+            if magic != MAGIC or meta["key"] != key:
+                mm.close()
+                return None
+            if _data_end(meta, meta_len) > len(mm):
+                raise ValueError("file is truncated")
+            return _from_buffer(memoryview(mm), meta, mm)
+        except BaseException:
+            try:
+                mm.close()
+            except BufferError:
+                # Views made before the failure are still alive; the map closes once they are collected
+                pass
+            raise
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        Logger.warning(f"Map cache for {path} unusable, rebuilding: {e}")
+        return None
+
+
+def store(path: str, baked: BakedMap) -> None:
+    if not GameSettings.MAP_CACHE_DIR:
+        return
+    try:
+        key = cache_key(path)
+        file = cache_file(path, key)
+        file.parent.mkdir(parents=True, exist_ok=True)
+
+        blobs: list[bytes] = []
+        offset = 0
+
+        def add(blob: bytes) -> int:
+            nonlocal offset
+            start = offset
+            blobs.append(blob)
+            pad = -len(blob) % ALIGN
+            if pad:
+                blobs.append(bytes(pad))
+            offset += len(blob) + pad
+            return start
+
+        # Blob offsets are relative to the end of the (padded) header
+        meta = {
+            "key": key,
+            "width": baked.width,
+            "height": baked.height,
+            "tile_size": GameSettings.TILE_SIZE,
+            "layers": [add(array("I", layer).tobytes()) for layer in baked.layers],
+            "collision": add(bytes(baked.collision)),
+            "grass": add(bytes(baked.grass)),
+            "tiles": {str(gid): [add(_rgba_bytes(image)), baked.opaque[gid]]
+                      for gid, image in baked.tiles.items()},
+        }
+        meta_bytes = json.dumps(meta).encode()
+        head = HEADER.pack(MAGIC, len(meta_bytes)) + meta_bytes
+        head += bytes(-len(head) % ALIGN)
+
+        tmp = file.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(head)
+            f.writelines(blobs)
+        os.replace(tmp, file)
+        # Entries for older versions of the same map are dead now
+        for old in file.parent.glob(f"{Path(path).stem}-*.bin"):
+            if old != file:
+                old.unlink(missing_ok=True)
+    except OSError as e:
+        Logger.warning(f"Could not write map cache for {path}: {e}")
+
+
+def _rgba_bytes(image: pg.Surface) -> bytes:
+    if not image.get_flags() & pg.SRCALPHA:
+        # tobytes("RGBA") of a surface without per-pixel alpha leaves alpha at 0
+        rgba = pg.Surface(image.get_size(), pg.SRCALPHA)
+        rgba.blit(image, (0, 0))
+        image = rgba
+    return pg.image.tobytes(image, "RGBA")
+
+
+def _data_end(meta: dict, meta_len: int) -> int:
+    '''Size the file needs to hold every blob meta points to.'''
+    base = HEADER.size + meta_len
+    base += -base % ALIGN
+    cells = meta["width"] * meta["height"]
+    tile_bytes = meta["tile_size"] ** 2 * 4
+    ends = [off + cells * 4 for off in meta["layers"]]
+    ends += [meta["collision"] + cells, meta["grass"] + cells]
+    ends += [off + tile_bytes for off, _ in meta["tiles"].values()]
+    return base + max(ends, default=0)
+
+
+def _from_buffer(buf: memoryview, meta: dict, mm: mmap.mmap) -> BakedMap:
+    _, meta_len = HEADER.unpack_from(buf, 0)
+    base = HEADER.size + meta_len
+    base += -base % ALIGN
+    width, height = meta["width"], meta["height"]
+    cells = width * height
+    tile = meta["tile_size"]
+    tile_bytes = tile * tile * 4
+
+    layers = [buf[base + off:base + off + cells * 4].cast("I") for off in meta["layers"]]
+    tiles = {}
+    opaque = {}
+    for gid, (off, is_opaque) in meta["tiles"].items():
+        tiles[int(gid)] = pg.image.frombuffer(buf[base + off:base + off + tile_bytes], (tile, tile), "RGBA")
+        opaque[int(gid)] = is_opaque
+    return BakedMap(
+        width, height, layers, tiles, opaque,
+        bytearray(buf[base + meta["collision"]:base + meta["collision"] + cells]),
+        bytearray(buf[base + meta["grass"]:base + meta["grass"] + cells]),
+        mm,
+    )
@@ -17,11 +17,13 @@ from src.interface.windows.menu_window import MenuWindow
 from src.interface.windows.bag_window import BagWindow
 from src.interface.windows.setting_window import SettingWindow
 from src.interface.windows.shop_window import ShopWindow
+from src.interface.net_overlay import NetOverlay
 
 class GameScene(Scene):
     game_manager: GameManager
     online_manager: OnlineManager | None
     sprite_online: Sprite
+    _online_pos: Position
 
     '''check point 2 - 1: Overlay'''
     menu_button: Button
@@ -37,6 +39,9 @@ class GameScene(Scene):
 
     '''check point 3 -2: Shop Overlay'''
     shop_window: ShopWindow
+
+    # F3: network diagnostics
+    net_overlay: NetOverlay
     
     def __init__(self):
         super().__init__()
@@ -53,6 +58,8 @@ class GameScene(Scene):
         else:
             self.online_manager = None
         self.sprite_online = Sprite("ingame_ui/options1.png", (GameSettings.TILE_SIZE, GameSettings.TILE_SIZE))
+        # Reused every frame to place remote players
+        self._online_pos = Position(0, 0)
 
         ## 字型
         self.font_title = pg.font.Font("././assets/fonts/Pokemon Solid.ttf", 30)
@@ -103,6 +110,8 @@ class GameScene(Scene):
         ## check point 3 -2: Shop Overlay 初始化 shop ##
         self.shop_window = ShopWindow(self.game_manager, self.font_title, self.font_item)
 
+        self.net_overlay = NetOverlay("././assets/fonts/Minecraft.ttf", 16)
+
     ## 當 SettingWindow 讀取存檔後，會呼叫此函式來更新所有場景中的參照 ##
     def on_game_reload(self, new_manager: GameManager):
         self.game_manager = new_manager
@@ -133,6 +142,11 @@ class GameScene(Scene):
     @override
     def update(self, dt: float):
 
+        if input_manager.key_pressed(pg.K_F3):
+            self.net_overlay.toggle()
+        if self.online_manager:
+            self.online_manager.stats.observe_frame(dt)
+
         self.menu_button.update(dt)
         self.setting_button.update(dt)
         self.bag_button.update(dt)
@@ -233,7 +247,7 @@ class GameScene(Scene):
                     return
                 
             '''check point 3 -2: Shop Interaction'''
-            for merchant in self.game_manager.merchants.get(self.game_manager.current_map_key, []):
+            for merchant in self.game_manager.current_merchants:
                 merchant.update(dt)
                 if merchant.detected and input_manager.key_pressed(pg.K_SPACE):
                     Logger.info("Store Triggered!")
@@ -247,7 +261,10 @@ class GameScene(Scene):
                 _ = self.online_manager.update(
                     self.game_manager.player.position.x, 
                     self.game_manager.player.position.y,
-                    self.game_manager.current_map.path_name
+                    self.game_manager.current_map.path_name,
+                    self.game_manager.player.direction.value,
+                    self.game_manager.player.velocity.x,
+                    self.game_manager.player.velocity.y
                 )
         
     @override
@@ -271,17 +288,19 @@ class GameScene(Scene):
         for enemy in self.game_manager.current_enemy_trainers:
             enemy.draw(screen, camera)
 
-        for merchant in self.game_manager.merchants.get(self.game_manager.current_map_key, []):
+        for merchant in self.game_manager.current_merchants:
             merchant.draw(screen, camera)
 
         self.game_manager.bag.draw(screen)
         
         if self.online_manager and self.game_manager.player:
-            list_online = self.online_manager.get_list_players()
-            for player in list_online:
-                if player["map"] == self.game_manager.current_map.path_name:
-                    camera = self.game_manager.player.camera
-                    pos = camera.transform_position_as_position(Position(player["x"], player["y"]))
+            camera = self.game_manager.player.camera
+            map_name = self.game_manager.current_map.path_name
+            pos = self._online_pos
+            for remote in self.online_manager.sample_remote_players(time.monotonic()):
+                if remote.map == map_name:
+                    pos.x = int(remote.x) - camera.x
+                    pos.y = int(remote.y) - camera.y
                     self.sprite_online.update_pos(pos)
                     self.sprite_online.draw(screen)
 
@@ -305,4 +324,9 @@ class GameScene(Scene):
             s.set_alpha(150)
             s.fill((0,0,0))
             screen.blit(s, bg_rect.topleft)
-            screen.blit(log_txt, log_rect)
\ No newline at end of file
+            screen.blit(log_txt, log_rect)
+
+        if self.net_overlay.is_open:
+            now = time.monotonic()
+            row = self.online_manager.diagnostics(now) if self.online_manager else None
+            self.net_overlay.draw(screen, row, now)
\ No newline at end of file
@@ -10,11 +10,18 @@ class Settings:
     DEBUG: bool = True          # Debug mode
     TILE_SIZE: int = 64         # Size of each tile in pixels
     DRAW_HITBOXES: bool = True  # Draw hitboxes for debugging
+    MAP_CACHE_DIR: str = ".cache/maps" # Baked maps are kept here between runs, empty to disable
+    MAX_LOADED_MAPS: int = 3    # Maps kept in memory, the least recently visited ones are unloaded
+    MAP_PRELOAD: bool = True    # Build the maps behind the current map's doors on a background thread
     # Audio
     MAX_CHANNELS: int = 16
     AUDIO_VOLUME: float = 0.5   # Volume of audio
     # Online
     IS_ONLINE: bool = False
     ONLINE_SERVER_URL: str = "http://localhost:8989"
+    ONLINE_BINARY: bool = False # Use the compact binary format for /players
+    ONLINE_UDP: bool = False # Send position updates as UDP datagrams when the server offers it
+    ONLINE_STATS_CSV: str = "" # Append network diagnostics to this CSV file, empty to disable
+    ONLINE_STATS_INTERVAL: float = 1.0 # Seconds between CSV rows
     
 GameSettings = Settings()
\ No newline at end of file
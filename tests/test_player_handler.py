@@ -0,0 +1,45 @@
+import math
+import time
+
+from server.playerHandler import PlayerHandler
+
+
+def test_bad_buffered_update_does_not_stop_the_tick():
+    handler = PlayerHandler(tick_rate=20)
+    good, bad = handler.register(), handler.register()
+    # No grid cell for an infinite position, applying it raises
+    handler.update(bad, math.inf, 0.0, "map.tmx")
+    handler.update(good, 32.0, 48.0, "map.tmx")
+    tick = handler.published.tick
+
+    assert handler.run_tick()
+    assert handler.published.tick == tick + 1
+    assert handler.metrics.updates_failed == 1
+    assert (handler.get(good).x, handler.get(good).y) == (32.0, 48.0)
+
+    handler.update(good, 64.0, 48.0, "map.tmx")
+    handler.run_tick()
+    assert handler.published.tick == tick + 2
+    assert handler.get(good).x == 64.0
+
+
+def test_tick_thread_keeps_publishing_after_a_bad_update():
+    handler = PlayerHandler(tick_rate=100)
+    pid = handler.register()
+    handler.start()
+    try:
+        handler.update(pid, math.nan, 0.0, "map.tmx")
+        tick = handler.published.tick
+        deadline = time.monotonic() + 2.0
+        while handler.published.tick < tick + 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handler.published.tick >= tick + 3
+
+        handler.update(pid, 16.0, 16.0, "map.tmx")
+        deadline = time.monotonic() + 2.0
+        while handler.get(pid).x != 16.0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handler.get(pid).map == "map.tmx"
+        assert handler.get(pid).x == 16.0
+    finally:
+        handler.stop()
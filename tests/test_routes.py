@@ -0,0 +1,27 @@
+from server.playerHandler import PlayerHandler
+from server.routes import Router
+
+JSON = {"content-type": "application/json"}
+# json.loads reads these as float inf or as an int too large for a float
+HUGE = ("Infinity", "-Infinity", "1e400", "1" + "0" * 400)
+
+
+def post(router: Router, path: str, body: str) -> int:
+    return router.handle_post(path, JSON, body.encode()).code
+
+
+def test_out_of_range_numbers_are_bad_fields():
+    router = Router(PlayerHandler())
+    pid = router.player_handler.register()
+    for value in HUGE:
+        for fields in (f'"id": {value}, "x": 1, "y": 2',
+                       f'"id": {pid}, "x": 1, "y": 2, "dir": {value}',
+                       f'"id": {pid}, "x": {value}, "y": 2'):
+            update = f'{{{fields}, "map": "map.tmx"}}'
+            assert post(router, "/players", update) == 400, update
+            assert post(router, "/players/batch", f'{{"updates": [{update}]}}') == 400, update
+        timed = f'{{"id": {pid}, "x": 1, "y": 2, "map": "map.tmx", "t": {value}}}'
+        assert post(router, "/players/batch", f'{{"updates": [{timed}]}}') == 400, timed
+    for value in ("Infinity", "1e400"):
+        assert post(router, "/players/leave", f'{{"id": {value}}}') == 400, value
+    assert router.player_handler.get(pid).map == ""